@@ -2,38 +2,81 @@
 
 import os
 import re
+import time
+import statistics
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from ..cache import content_hash
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+# Model used when a provider is selected without a model name
+DEFAULT_MODELS = {"openai": "gpt-4.1-turbo", "gemini": "gemini-1.5-flash-latest"}
+
+# Bump when the map prompt or note parsing changes, so cached chunk notes are not reused
+MAP_PROMPT_VERSION = 1
+
 class BaseEvaluationAgent:
-    def __init__(self, criterion_config, api_keys):
+    def __init__(self, criterion_config, api_keys, base_urls=None):
         self.criterion_config = criterion_config
         self.api_keys = api_keys
+        self.base_urls = base_urls or {} # Optional endpoint overrides per provider, e.g. a local stub server
         self.llm = self._initialize_llm()
+        self.ensemble_config = criterion_config.get("ensemble")
+        self.ensemble_llms = self._initialize_ensemble_llms() if self.ensemble_config else []
 
-    def _initialize_llm(self):
-        provider = self.criterion_config.get("llm_provider", "openai") # Default to openai if not specified
-        model_name = self.criterion_config.get("model_name")
+    def _initialize_llm(self, provider=None, model_name=None, temperature=0.2):
+        # Ensemble samples may override the criterion's provider/model and temperature
+        provider = provider or self.criterion_config.get("llm_provider", "openai") # Default to openai if not specified
+        model_name = model_name or self.criterion_config.get("model_name")
 
         if provider == "openai":
             if not self.api_keys.get("OPENAI_API_KEY"):
                 raise ValueError("OpenAI API key not found. Please set the OPENAI_API_KEY environment variable.")
             return ChatOpenAI(
-                model_name=model_name or "gpt-4.1-turbo", # Default model if not specified
+                model_name=model_name or DEFAULT_MODELS["openai"], # Default model if not specified
                 api_key=self.api_keys["OPENAI_API_KEY"],
-                temperature=0.2 # Low temperature for more deterministic output
+                temperature=temperature, # Low temperature by default for more deterministic output
+                base_url=self.base_urls.get("openai") # None keeps the official endpoint
             )
         elif provider == "gemini":
             if not self.api_keys.get("GEMINI_API_KEY"):
                 raise ValueError("Gemini API key not found. Please set the GEMINI_API_KEY environment variable.")
+            endpoint_options = {}
+            if self.base_urls.get("gemini"):
+                endpoint_options = {"client_options": {"api_endpoint": self.base_urls["gemini"]}}
             return ChatGoogleGenerativeAI(
-                model=model_name or "gemini-1.5-flash-latest", # Default model if not specified
+                model=model_name or DEFAULT_MODELS["gemini"], # Default model if not specified
                 google_api_key=self.api_keys["GEMINI_API_KEY"],
-                temperature=0.2 # Low temperature for more deterministic output
+                temperature=temperature, # Low temperature by default for more deterministic output
+                **endpoint_options
             )
         else:
             raise ValueError(f"Unsupported LLM provider: {provider}")
 
+    def _initialize_ensemble_llms(self):
+        """Builds one LLM per model listed in the "ensemble" block (defaults to the criterion's own model).
+
+        Returns:
+            list: (llm_provider, model_name, llm) tuples; samples are assigned to them round-robin.
+        """
+        temperature = self.ensemble_config.get("temperature", 0.2)
+        models = self.ensemble_config.get("models") or [{
+            "llm_provider": self.criterion_config.get("llm_provider", "openai"),
+            "model_name": self.criterion_config.get("model_name")
+        }]
+        criterion_provider = self.criterion_config.get("llm_provider", "openai")
+        ensemble_llms = []
+        for model in models:
+            provider = model.get("llm_provider", criterion_provider)
+            model_name = model.get("model_name")
+            if not model_name:
+                # The criterion's model only makes sense for its own provider
+                model_name = self.criterion_config.get("model_name") if provider == criterion_provider else None
+                model_name = model_name or DEFAULT_MODELS.get(provider)
+            ensemble_llms.append((provider, model_name, self._initialize_llm(provider, model_name, temperature)))
+        return ensemble_llms
+
     def _construct_prompt(self, paper_text_segment, reference_material_text=None):
         criterion_name = self.criterion_config["name"]
         criterion_desc = self.criterion_config["description"]
@@ -74,13 +117,40 @@ class BaseEvaluationAgent:
             "Pontuação: [sua pontuação aqui]",
             "Justificativa: [sua justificativa aqui]"
         ])
+
+        # Self-reported confidence, used by the cascade agent to decide on escalation
+        if self.criterion_config.get("request_confidence"):
+            prompt_lines.extend([
+                "4. Após a justificativa, informe em uma última linha o seu grau de confiança na pontuação atribuída, como um número de 0 a 100, no formato:",
+                "Confiança: [sua confiança aqui]"
+            ])
         
         return "\n\n".join(prompt_lines)
 
+    def _construct_map_prompt(self, chunk_text, chunk_index, total_chunks):
+        criterion_name = self.criterion_config["name"]
+        criterion_desc = self.criterion_config["description"]
+
+        prompt_lines = [
+            f"Você é um assistente de IA especializado na avaliação de trabalhos acadêmicos. Você receberá a parte {chunk_index + 1} de {total_chunks} de um trabalho acadêmico longo, que será avaliado posteriormente com base no seguinte critério:",
+            f"Critério: {criterion_name}",
+            f"Descrição do Critério: {criterion_desc}",
+            "---INÍCIO DA PARTE DO TRABALHO ACADÊMICO---",
+            chunk_text,
+            "---FIM DA PARTE DO TRABALHO ACADÊMICO---",
+            "Instruções para Resposta:",
+            "1. NÃO atribua pontuação. Extraia apenas notas compactas (no máximo 10 tópicos curtos) com as evidências desta parte que sejam relevantes para o critério: pontos fortes, fragilidades, trechos, dados e referências citados.",
+            "2. Indique as páginas ou seções quando possível.",
+            "3. Se esta parte não contiver nada relevante para o critério, responda apenas: Nada relevante.",
+            "Sua resposta DEVE seguir o formato:",
+            "Notas: [suas notas aqui]"
+        ]
+        return "\n\n".join(prompt_lines)
+
     def _parse_response(self, response_text):
         try:
             score_match = re.search(r"Pontuação:\s*(\d+)", response_text, re.IGNORECASE)
-            justification_match = re.search(r"Justificativa:\s*(.+)", response_text, re.IGNORECASE | re.DOTALL)
+            justification_match = re.search(r"Justificativa:\s*(.+?)(?:\n\s*Confiança:.*)?$", response_text, re.IGNORECASE | re.DOTALL)
 
             score = int(score_match.group(1)) if score_match else None
             justification = justification_match.group(1).strip() if justification_match else None
@@ -100,35 +170,281 @@ class BaseEvaluationAgent:
             print(f"Error parsing LLM response: {e}. Response: {response_text}")
             return 0, f"Erro ao processar a resposta do modelo: {e}"
 
+    def _is_well_formed(self, response_text):
+        """Checks that a response has a score within range and a justification, without clipping or fallbacks."""
+        score_match = re.search(r"Pontuação:\s*(\d+)", response_text, re.IGNORECASE)
+        justification_match = re.search(r"Justificativa:\s*\S", response_text, re.IGNORECASE)
+        if not score_match or not justification_match:
+            return False
+        return 0 <= int(score_match.group(1)) <= self.criterion_config["max_points"]
+
+    def _invoke_llm(self, prompt, llm=None):
+        """Calls the LLM and measures the request.
+
+        Returns:
+            tuple: (response_content, usage) where usage holds latency_seconds, input_tokens and output_tokens.
+        """
+        llm = llm or self.llm
+        start = time.perf_counter()
+        response = llm.invoke(prompt)
+        latency = time.perf_counter() - start
+
+        response_content = response.content if hasattr(response, 'content') else str(response)
+        usage_metadata = getattr(response, "usage_metadata", None) or {}
+        usage = {
+            "latency_seconds": round(latency, 3),
+            "input_tokens": usage_metadata.get("input_tokens"),
+            "output_tokens": usage_metadata.get("output_tokens")
+        }
+        return response_content, usage
+
+    def _build_result(self, score, justification, **extra):
+        result = {
+            "criterion_id": self.criterion_config["id"],
+            "criterion_name": self.criterion_config["name"],
+            "score": score,
+            "max_points": self.criterion_config["max_points"],
+            "justification": justification,
+            "llm_provider": self.criterion_config.get("llm_provider"),
+            "model_name": self.criterion_config.get("model_name")
+        }
+        result.update(extra)
+        return result
+
+    def _aggregate_scores(self, scores):
+        if self.ensemble_config.get("aggregate", "median") == "majority":
+            counts = Counter(scores).most_common()
+            tied = [score for score, count in counts if count == counts[0][1]]
+            return statistics.median_low(tied) # Break ties towards the lower of the most voted scores
+        return statistics.median_low(scores) # median_low keeps the score an integer present in the samples
+
+    def _evaluate_ensemble(self, prompt):
+        """Samples the criterion several times and stops once `agreement` samples return the same score.
+
+        At most `max_concurrency` samples are in flight at once. A new sample is issued only when a result
+        that doesn't reach agreement comes back, or a sample fails, and the samples still in flight could
+        not reach agreement on their own. Early stopping therefore saves API calls, not just wall-clock time. Configured per criterion in `criteria.json`:
+
+            "ensemble": {
+                "samples": 5,              # maximum number of samples
+                "agreement": 3,            # identical scores needed to stop early (default: simple majority)
+                "aggregate": "median",     # "median" or "majority"
+                "max_concurrency": 3,      # samples in flight at once (default: agreement)
+                "temperature": 0.2,
+                "models": [{"llm_provider": "openai", "model_name": "gpt-4.1"},
+                           {"llm_provider": "gemini", "model_name": "gemini-1.5-flash"}]
+            }
+
+        When agreement is reached, the agreed score is returned; otherwise the samples are combined with
+        `aggregate`. Malformed answers and failed calls are discarded rather than counted as a zero. The
+        result is labelled with the models that produced the kept samples.
+        """
+        num_samples = self.ensemble_config.get("samples", 3)
+        agreement = self.ensemble_config.get("agreement", num_samples // 2 + 1)
+        max_concurrency = max(1, min(self.ensemble_config.get("max_concurrency", agreement), num_samples))
+
+        samples = []
+        failed = 0
+        issued = 0
+        agreed = False
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        in_flight = {}
+
+        def issue_sample():
+            nonlocal issued
+            provider, model_name, llm = self.ensemble_llms[issued % len(self.ensemble_llms)]
+            in_flight[executor.submit(self._invoke_llm, prompt, llm)] = (provider, model_name)
+            issued += 1
+
+        try:
+            while issued < max_concurrency:
+                issue_sample()
+
+            while in_flight and not agreed:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    provider, model_name = in_flight.pop(future)
+                    try:
+                        response_content, usage = future.result()
+                    except Exception as e:
+                        print(f"Error during ensemble sample for criterion {self.criterion_config['id']} ({model_name}): {e}")
+                        failed += 1
+                        continue
+                    if not self._is_well_formed(response_content):
+                        print(f"Discarding malformed ensemble sample for criterion {self.criterion_config['id']} ({model_name}).")
+                        failed += 1
+                        continue
+
+                    score, justification = self._parse_response(response_content)
+                    samples.append({"llm_provider": provider, "model_name": model_name, "score": score,
+                                    "justification": justification, **usage})
+                    if Counter(sample["score"] for sample in samples).most_common(1)[0][1] >= agreement:
+                        agreed = True
+                        break
+
+                # Top up only when the samples in flight can't reach agreement even if they all match the leading score
+                leading_count = Counter(sample["score"] for sample in samples).most_common(1)[0][1] if samples else 0
+                while (not agreed and issued < num_samples and len(in_flight) < max_concurrency
+                       and leading_count + len(in_flight) < agreement):
+                    issue_sample()
+        finally:
+            # Don't wait for samples still in flight once agreement is reached
+            executor.shutdown(wait=False, cancel_futures=True)
+        wall_clock = time.perf_counter() - start
+        early_stopped = agreed and issued < num_samples
+
+        if not samples:
+            return self._build_result(0, f"Erro ao contatar o modelo de linguagem: nenhuma das {issued} amostras do ensemble retornou uma resposta válida.", llm_error=True)
+
+        scores = [sample["score"] for sample in samples]
+        if agreed:
+            # Stopping on agreement means the agreed score is the answer, even if a median of the samples differs
+            score = Counter(scores).most_common(1)[0][0]
+        else:
+            score = self._aggregate_scores(scores)
+        representative = next(sample for sample in samples if sample["score"] == score)
+        ensemble_info = {
+            "aggregate": self.ensemble_config.get("aggregate", "median"),
+            "scores": scores,
+            "models": [sample["model_name"] for sample in samples],
+            "spread": max(scores) - min(scores),
+            "stdev": round(statistics.pstdev(scores), 3),
+            "samples_requested": num_samples,
+            "samples_issued": issued,
+            "samples_completed": len(samples),
+            "samples_failed": failed,
+            "agreed": agreed,
+            "early_stopped": early_stopped
+        }
+        print(f"Ensemble for criterion {self.criterion_config['id']}: scores {scores} -> {score} (spread {ensemble_info['spread']}, {issued}/{num_samples} samples issued).")
+        input_tokens = [sample["input_tokens"] for sample in samples]
+        output_tokens = [sample["output_tokens"] for sample in samples]
+        return self._build_result(
+            score, representative["justification"],
+            # The CSV's Assigned_LLM_* columns should name the models that actually scored the paper
+            llm_provider="+".join(dict.fromkeys(sample["llm_provider"] for sample in samples)),
+            model_name="+".join(dict.fromkeys(sample["model_name"] or "" for sample in samples)),
+            latency_seconds=round(wall_clock, 3),
+            input_tokens=sum(input_tokens) if None not in input_tokens else None,
+            output_tokens=sum(output_tokens) if None not in output_tokens else None,
+            ensemble=ensemble_info
+        )
+
     def evaluate(self, paper_text_segment, reference_material_text=None):
         prompt = self._construct_prompt(paper_text_segment, reference_material_text)
+
+        if self.ensemble_llms:
+            return self._evaluate_ensemble(prompt)
         
         try:
-            response = self.llm.invoke(prompt)
-            response_content = response.content if hasattr(response, 'content') else str(response)
+            response_content, usage = self._invoke_llm(prompt)
         except Exception as e:
             print(f"Error during LLM call for criterion {self.criterion_config['id']}: {e}")
-            return {
-                "criterion_id": self.criterion_config["id"],
-                "criterion_name": self.criterion_config["name"],
-                "score": 0,
-                "max_points": self.criterion_config["max_points"],
-                "justification": f"Erro ao contatar o modelo de linguagem: {e}",
-                "llm_provider": self.criterion_config.get("llm_provider"),
-                "model_name": self.criterion_config.get("model_name")
-            }
+            return self._build_result(0, f"Erro ao contatar o modelo de linguagem: {e}", llm_error=True)
 
         score, justification = self._parse_response(response_content)
         
-        return {
-            "criterion_id": self.criterion_config["id"],
-            "criterion_name": self.criterion_config["name"],
-            "score": score,
-            "max_points": self.criterion_config["max_points"],
-            "justification": justification,
-            "llm_provider": self.criterion_config.get("llm_provider"),
-            "model_name": self.criterion_config.get("model_name")
+        return self._build_result(score, justification, **usage)
+
+    def _map_llm(self):
+        """Returns the (provider, model name, client) used for the map phase of long documents."""
+        return self.criterion_config.get("llm_provider", "openai"), self.criterion_config.get("model_name"), self.llm
+
+    def _map_chunk(self, chunk_text, chunk_index, total_chunks, llm=None):
+        prompt = self._construct_map_prompt(chunk_text, chunk_index, total_chunks)
+        response_content, usage = self._invoke_llm(prompt, llm)
+        notes_match = re.search(r"Notas:\s*(.+)", response_content, re.IGNORECASE | re.DOTALL)
+        notes = notes_match.group(1).strip() if notes_match else response_content.strip()
+        return notes, usage
+
+    def evaluate_long_document(self, chunks, reference_material_text=None, notes_cache=None, max_workers=4):
+        """Map-reduce evaluation for papers that don't fit in a single prompt.
+
+        Each chunk is condensed concurrently into compact notes for this criterion (map), and the
+        notes are then scored together through the regular `evaluate` path (reduce), so cascades
+        and ensembles still apply. The map phase runs on the model returned by `_map_llm`. Notes are
+        cached per criterion, map prompt version, map model and chunk content, so re-scoring a
+        criterion only repeats the reduce step.
+
+        Args:
+            chunks (list): Page-aligned chunks of the paper text, in order.
+            reference_material_text (str | None): Reference material, only used in the reduce step.
+            notes_cache (FileCache | None): Cache for chunk notes.
+            max_workers (int): Maximum number of chunks mapped concurrently.
+
+        Returns:
+            dict: The evaluation result, with a "long_document" entry describing the map phase. If some
+                chunks failed, the result is flagged with "partial_evidence" and an "evaluation_errors" note.
+        """
+        map_provider, map_model, map_llm = self._map_llm()
+        notes = [None] * len(chunks)
+        cache_keys = [
+            content_hash(f"map-v{MAP_PROMPT_VERSION}", self.criterion_config["id"], self.criterion_config["description"],
+                         map_provider or "", map_model or "", chunk)
+            for chunk in chunks
+        ]
+        if notes_cache:
+            for i, key in enumerate(cache_keys):
+                notes[i] = notes_cache.get(key)
+        cached = sum(1 for note in notes if note is not None)
+
+        pending = [i for i, note in enumerate(notes) if note is None]
+        failed = 0
+        map_input_tokens, map_output_tokens = None, None
+        start = time.perf_counter()
+        if pending:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self._map_chunk, chunks[i], i, len(chunks), map_llm): i for i in pending}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        notes[i], usage = future.result()
+                    except Exception as e:
+                        # A missing chunk degrades the evaluation but shouldn't discard the others
+                        print(f"Error during map step for criterion {self.criterion_config['id']}, chunk {i + 1}/{len(chunks)}: {e}")
+                        failed += 1
+                        continue
+                    if usage["input_tokens"] is not None:
+                        map_input_tokens = (map_input_tokens or 0) + usage["input_tokens"]
+                    if usage["output_tokens"] is not None:
+                        map_output_tokens = (map_output_tokens or 0) + usage["output_tokens"]
+                    if notes_cache:
+                        notes_cache.set(cache_keys[i], notes[i])
+        map_latency = time.perf_counter() - start
+
+        long_document_info = {
+            "chunks": len(chunks),
+            "cached_chunks": cached,
+            "failed_chunks": failed,
+            "map_provider": map_provider,
+            "map_model": map_model,
+            "map_latency_seconds": round(map_latency, 3),
+            "map_input_tokens": map_input_tokens, # Cached chunks cost no tokens
+            "map_output_tokens": map_output_tokens
         }
+        if failed == len(chunks):
+            result = self._build_result(0, "Erro ao contatar o modelo de linguagem: nenhuma parte do documento longo pôde ser processada.", llm_error=True)
+            result["long_document"] = long_document_info
+            return result
+
+        notes_sections = [
+            f"[Parte {i + 1} de {len(chunks)}]\n{note if note is not None else 'Parte não processada devido a um erro.'}"
+            for i, note in enumerate(notes)
+        ]
+        notes_segment = "\n\n".join([
+            "O trabalho acadêmico é longo demais para ser enviado integralmente. Abaixo estão notas extraídas de cada uma de suas partes, em ordem; avalie o trabalho completo com base nelas."
+        ] + notes_sections)
+
+        result = self.evaluate(notes_segment, reference_material_text)
+        result["long_document"] = long_document_info
+        if failed:
+            # A grade from partial evidence must be visible, not only hinted at inside the prompt
+            result["partial_evidence"] = True
+            result.setdefault("evaluation_errors", []).append(
+                f"Avaliação baseada em {len(chunks) - failed} de {len(chunks)} partes do documento; {failed} parte(s) não puderam ser processadas."
+            )
+        return result
 
 if __name__ == '__main__':
     # This is a placeholder for testing. 
@@ -0,0 +1,236 @@
+# src/agents/cascade_agent.py
+
+import re
+from .base_agent import BaseEvaluationAgent
+
+DEFAULT_FAST_PROVIDER = "gemini"
+DEFAULT_FAST_MODEL = "gemini-1.5-flash"
+DEFAULT_MIN_CONFIDENCE = 70
+
+class CascadeEvaluationAgent(BaseEvaluationAgent):
+    """Evaluates a criterion with a fast, cheap model first and escalates to the
+    criterion's configured (stronger) model only when the fast answer is not trusted.
+
+    The cascade is configured per criterion in `criteria.json`:
+
+        "cascade": {
+            "llm_provider": "gemini",           # fast tier provider
+            "model_name": "gemini-1.5-flash",   # fast tier model
+            "min_confidence": 70,               # escalate below this self-reported confidence (0-100)
+            "escalate_on_scores": [1],          # escalate when the fast score lands on a boundary
+            "shadow": false                     # also call the strong model to calibrate thresholds
+        }
+
+    Malformed answers (missing score/justification, score out of range) and errors
+    while calling the fast model always escalate. If the strong model then fails, a
+    well-formed fast answer is kept instead of the error. For long documents, the map phase
+    also runs on the fast tier; only the reduce step goes through the cascade.
+    """
+
+    def __init__(self, criterion_config, api_keys, base_urls=None):
+        self.cascade_config = criterion_config.get("cascade") or {}
+        strong_config = {key: value for key, value in criterion_config.items() if key != "cascade"}
+        super().__init__(strong_config, api_keys, base_urls)
+
+        # The fast tier only swaps the model and asks for a confidence line; prompt and parsing are shared.
+        # It stays a single cheap call: an "ensemble" block applies to the strong model only.
+        fast_config = {key: value for key, value in strong_config.items() if key != "ensemble"}
+        fast_config["llm_provider"] = self.cascade_config.get("llm_provider", DEFAULT_FAST_PROVIDER)
+        fast_config["model_name"] = self.cascade_config.get("model_name", DEFAULT_FAST_MODEL)
+        fast_config["request_confidence"] = True
+        self.fast_agent = BaseEvaluationAgent(fast_config, api_keys, base_urls)
+
+    def _map_llm(self):
+        # Condensing chunks into notes needs no judgement, so the map phase of long documents runs on the fast tier
+        return self.fast_agent._map_llm()
+
+    def _parse_confidence(self, response_text):
+        confidence_match = re.search(r"Confiança:\s*(\d+(?:[.,]\d+)?)", response_text, re.IGNORECASE)
+        if not confidence_match:
+            return None
+        confidence = float(confidence_match.group(1).replace(",", "."))
+        # Some models answer on a 0-1 scale despite the instructions
+        return confidence * 100 if confidence <= 1 else confidence
+
+    def _escalation_reason(self, response_text, score, confidence):
+        """Returns why the fast answer should be escalated, or None if it can be kept."""
+        if not self._is_well_formed(response_text):
+            return "resposta_malformada"
+        if confidence is None:
+            return "confianca_ausente"
+        if confidence < self.cascade_config.get("min_confidence", DEFAULT_MIN_CONFIDENCE):
+            return "confianca_baixa"
+        if score in self.cascade_config.get("escalate_on_scores", []):
+            return "pontuacao_limite"
+        return None
+
+    def evaluate(self, paper_text_segment, reference_material_text=None):
+        fast_prompt = self.fast_agent._construct_prompt(paper_text_segment, reference_material_text)
+        cascade_info = {
+            "fast_provider": self.fast_agent.criterion_config["llm_provider"],
+            "fast_model": self.fast_agent.criterion_config["model_name"],
+            "fast_score": None,
+            "fast_confidence": None,
+            "fast_latency_seconds": None,
+            "fast_input_tokens": None,
+            "fast_output_tokens": None,
+            "escalated": False,
+            "reason": None,
+            "strong_score": None,
+            "strong_latency_seconds": None,
+            "strong_input_tokens": None,
+            "strong_output_tokens": None,
+            "strong_failed": False,
+            "shadow": bool(self.cascade_config.get("shadow", False))
+        }
+
+        fast_result = None
+        try:
+            response_content, usage = self.fast_agent._invoke_llm(fast_prompt)
+            score, justification = self.fast_agent._parse_response(response_content)
+            confidence = self._parse_confidence(response_content)
+            cascade_info.update({
+                "fast_score": score,
+                "fast_confidence": confidence,
+                "fast_latency_seconds": usage["latency_seconds"],
+                "fast_input_tokens": usage["input_tokens"],
+                "fast_output_tokens": usage["output_tokens"]
+            })
+            cascade_info["reason"] = self._escalation_reason(response_content, score, confidence)
+            fast_result = self.fast_agent._build_result(score, justification, **usage)
+        except Exception as e:
+            print(f"Error during fast-tier LLM call for criterion {self.criterion_config['id']}: {e}")
+            cascade_info["reason"] = "erro_modelo_rapido"
+
+        cascade_info["escalated"] = cascade_info["reason"] is not None
+        if not cascade_info["escalated"] and not cascade_info["shadow"]:
+            fast_result["cascade"] = cascade_info
+            return fast_result
+
+        # Escalated (or shadowed for calibration): run the criterion's configured model
+        strong_result = super().evaluate(paper_text_segment, reference_material_text)
+        cascade_info.update({
+            "strong_score": strong_result["score"],
+            "strong_latency_seconds": strong_result.get("latency_seconds"),
+            "strong_input_tokens": strong_result.get("input_tokens"),
+            "strong_output_tokens": strong_result.get("output_tokens"),
+            "strong_failed": bool(strong_result.get("llm_error"))
+        })
+
+        result = strong_result if cascade_info["escalated"] else fast_result
+        if cascade_info["escalated"]:
+            print(f"Cascade escalated criterion {self.criterion_config['id']} to {self.criterion_config.get('model_name')} ({cascade_info['reason']}).")
+            # A well-formed fast answer that was only doubted beats the strong model's error placeholder
+            if cascade_info["strong_failed"] and cascade_info["reason"] not in ("resposta_malformada", "erro_modelo_rapido"):
+                print(f"Strong model failed for criterion {self.criterion_config['id']}; keeping the fast-tier answer.")
+                result = fast_result
+        result["cascade"] = cascade_info
+        return result
+
+
+def _estimate_cost(model_pricing, model_name, input_tokens, output_tokens):
+    pricing = (model_pricing or {}).get(model_name)
+    if not pricing or input_tokens is None or output_tokens is None:
+        return None
+    return (input_tokens * pricing.get("input_per_million", 0) + output_tokens * pricing.get("output_per_million", 0)) / 1_000_000
+
+
+def cascade_call_records(all_evaluations_data, criteria, model_pricing=None):
+    """Flattens the cascade metadata of a run into one record per cascaded call.
+
+    Costs are estimated from `model_pricing` (USD per million tokens, keyed by model name) and
+    are None when pricing or token usage is missing. The strong-only cost of a non-escalated call
+    is estimated with the fast tier's token counts, since both tiers receive the same prompt.
+    Shadow calls are accounted as if they had not been made. For long documents, the map phase
+    is added to both costs, priced on the map model and on the strong model respectively.
+    """
+    strong_models = {criterion["id"]: criterion.get("model_name") for criterion in criteria}
+    records = []
+    for paper_eval_data in all_evaluations_data:
+        for eval_result in paper_eval_data.get("evaluations", []):
+            cascade_info = eval_result.get("cascade")
+            if not cascade_info:
+                continue
+            record = dict(cascade_info)
+            record["pdf_path"] = paper_eval_data.get("pdf_path")
+            record["criterion_id"] = eval_result.get("criterion_id")
+            record["final_score"] = eval_result.get("score")
+            record["strong_model"] = strong_models.get(record["criterion_id"])
+            long_document_info = eval_result.get("long_document") or {}
+            record["map_model"] = long_document_info.get("map_model")
+            record["map_input_tokens"] = long_document_info.get("map_input_tokens")
+            record["map_output_tokens"] = long_document_info.get("map_output_tokens")
+
+            fast_cost = _estimate_cost(model_pricing, record["fast_model"], record["fast_input_tokens"], record["fast_output_tokens"])
+            if record["strong_input_tokens"] is not None:
+                strong_cost = _estimate_cost(model_pricing, record["strong_model"], record["strong_input_tokens"], record["strong_output_tokens"])
+            else:
+                strong_cost = _estimate_cost(model_pricing, record["strong_model"], record["fast_input_tokens"], record["fast_output_tokens"])
+            map_cost, strong_map_cost = 0.0, 0.0
+            if record["map_input_tokens"] is not None:
+                map_cost = _estimate_cost(model_pricing, record["map_model"], record["map_input_tokens"], record["map_output_tokens"])
+                strong_map_cost = _estimate_cost(model_pricing, record["strong_model"], record["map_input_tokens"], record["map_output_tokens"])
+            if None in (fast_cost, strong_cost, map_cost, strong_map_cost):
+                record["actual_cost"] = None
+                record["strong_only_cost"] = None
+            else:
+                record["actual_cost"] = fast_cost + (strong_cost if record["escalated"] else 0.0) + map_cost
+                record["strong_only_cost"] = strong_cost + strong_map_cost
+            records.append(record)
+    return records
+
+
+def summarize_cascade(all_evaluations_data, criteria, model_pricing=None):
+    """Aggregates escalation rates, latency and cost saved per cascaded criterion.
+
+    Latency saved compares the run against calling the strong model on every paper, using the
+    mean latency observed on strong calls (escalated or shadow) for that criterion as the counterfactual.
+    """
+    summaries = {}
+    for record in cascade_call_records(all_evaluations_data, criteria, model_pricing):
+        summary = summaries.setdefault(record["criterion_id"], {
+            "criterion_id": record["criterion_id"],
+            "fast_model": record["fast_model"],
+            "strong_model": record["strong_model"],
+            "calls": 0,
+            "escalations": 0,
+            "reasons": {},
+            "fast_latency_seconds": 0.0,
+            "strong_latencies": [],
+            "actual_cost": 0.0,
+            "strong_only_cost": 0.0,
+            "cost_known": True
+        })
+        summary["calls"] += 1
+        if record["escalated"]:
+            summary["escalations"] += 1
+            summary["reasons"][record["reason"]] = summary["reasons"].get(record["reason"], 0) + 1
+        summary["fast_latency_seconds"] += record["fast_latency_seconds"] or 0.0
+        if record["strong_latency_seconds"] is not None:
+            summary["strong_latencies"].append(record["strong_latency_seconds"])
+        if record["actual_cost"] is None:
+            summary["cost_known"] = False
+        else:
+            summary["actual_cost"] += record["actual_cost"]
+            summary["strong_only_cost"] += record["strong_only_cost"]
+
+    results = []
+    for summary in summaries.values():
+        strong_latencies = summary.pop("strong_latencies")
+        cost_known = summary.pop("cost_known")
+        summary["escalation_rate"] = summary["escalations"] / summary["calls"]
+        if strong_latencies:
+            mean_strong_latency = sum(strong_latencies) / len(strong_latencies)
+            actual_latency = summary["fast_latency_seconds"] + mean_strong_latency * summary["escalations"]
+            summary["latency_saved_seconds"] = round(mean_strong_latency * summary["calls"] - actual_latency, 3)
+        else:
+            summary["latency_saved_seconds"] = None # No strong call observed to compare against
+        if cost_known:
+            summary["cost_saved"] = round(summary["strong_only_cost"] - summary["actual_cost"], 6)
+        else:
+            summary["cost_saved"] = None # Pricing or token usage missing for at least one call
+            summary["actual_cost"] = None
+            summary["strong_only_cost"] = None
+        summary["fast_latency_seconds"] = round(summary["fast_latency_seconds"], 3)
+        results.append(summary)
+    return results
@@ -0,0 +1,80 @@
+# src/cache.py
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+def content_hash(*parts):
+    """Returns a stable SHA-256 hex digest of the given parts (str or bytes)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(part or b"")
+        digest.update(b"\0") # Separator so ("ab", "c") and ("a", "bc") hash differently
+    return digest.hexdigest()
+
+class FileCache:
+    """A small JSON cache, kept in memory and optionally persisted as one file per key.
+
+    The memory layer is a bounded LRU, so long-running processes (e.g. the job API) don't grow without
+    limit; entries evicted from it are still read back from disk when a cache directory is set.
+
+    Args:
+        cache_dir (str | None): Root directory for the persistent cache. If None, entries only live in memory.
+        namespace (str): Subdirectory separating unrelated caches (e.g. "chunk_notes", "pdf_text").
+        max_memory_entries (int): Maximum number of entries kept in memory. 0 disables the memory layer.
+    """
+
+    def __init__(self, cache_dir=None, namespace="default", max_memory_entries=256):
+        self.directory = os.path.join(cache_dir, namespace) if cache_dir else None
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if self.directory and not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key, value):
+        # Callers hold self._lock
+        if self.max_memory_entries <= 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if not self.directory or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Could not read cache entry {key} from {self.directory}: {e}")
+            return None
+        with self._lock:
+            self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        if not self.directory:
+            return
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Warning: Could not write cache entry {key} to {self.directory}: {e}")
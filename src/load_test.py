@@ -0,0 +1,146 @@
+# src/load_test.py
+
+import os
+import argparse
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .orchestrator import AcademicPaperOrchestrator
+from .stub_server import add_stub_arguments, stub_from_args
+
+def _percentile(values, percentile):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percentile / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def _format_seconds(value):
+    return f"{value:.3f}s" if value is not None else "N/A"
+
+def _run(args, cohort, base_urls, stub):
+    # Never the real keys: a misrouted request must fail instead of billing a real API
+    api_keys = {"OPENAI_API_KEY": "stub-key", "GEMINI_API_KEY": "stub-key"}
+
+    orchestrator = AcademicPaperOrchestrator(config_path=args.config_file, cache_dir=args.cache_dir, base_urls=base_urls)
+    if not orchestrator.criteria:
+        print(f"Could not load criteria from {args.config_file}. Exiting.")
+        return
+
+    print(f"Evaluating a cohort of {len(cohort)} paper(s) with concurrency {args.concurrency}...")
+    paper_latencies = []
+    def evaluate_paper(pdf_path):
+        start = time.perf_counter()
+        try:
+            output = orchestrator.run_evaluation(pdf_path=pdf_path, api_keys=api_keys)
+        except Exception as e:
+            output = {"pdf_path": pdf_path, "evaluations": [], "errors": [f"Critical error in load test: {str(e)}"]}
+        paper_latencies.append(time.perf_counter() - start)
+        return output
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outputs = list(executor.map(evaluate_paper, cohort))
+    wall_clock = time.perf_counter() - start
+
+    evaluations = [result for output in outputs for result in output.get("evaluations", [])]
+    # Timed by the orchestrator around the whole criterion, so cascade tiers, ensemble samples and the map phase are included
+    criterion_latencies = [result["criterion_latency_seconds"] for result in evaluations if result.get("criterion_latency_seconds") is not None]
+    # LLM errors plus the orchestrator's placeholders (missing PDF text or reference, agent crash)
+    failed_criteria = sum(1 for result in evaluations if result.get("llm_error") or result.get("evaluation_failed"))
+    # Errors absorbed inside a criterion, which don't show up as a failed criterion
+    fast_tier_errors = sum(1 for result in evaluations if (result.get("cascade") or {}).get("reason") == "erro_modelo_rapido")
+    failed_ensemble_samples = sum((result.get("ensemble") or {}).get("samples_failed", 0) for result in evaluations)
+    failed_map_chunks = sum((result.get("long_document") or {}).get("failed_chunks", 0) for result in evaluations)
+    stub_stats = stub.get_stats() if stub else None
+
+    summary = {
+        "papers": len(cohort),
+        "criteria_evaluated": len(evaluations),
+        "wall_clock_seconds": round(wall_clock, 3),
+        "papers_per_second": round(len(cohort) / wall_clock, 3) if wall_clock else None,
+        "criteria_per_second": round(len(evaluations) / wall_clock, 3) if wall_clock else None,
+        "criterion_latency_p50": _percentile(criterion_latencies, 50),
+        "criterion_latency_p95": _percentile(criterion_latencies, 95),
+        "criterion_latency_p99": _percentile(criterion_latencies, 99),
+        "criterion_latency_max": max(criterion_latencies) if criterion_latencies else None,
+        "paper_latency_p50": _percentile(paper_latencies, 50),
+        "paper_latency_p95": _percentile(paper_latencies, 95),
+        "failed_criteria": failed_criteria,
+        "fast_tier_errors": fast_tier_errors,
+        "failed_ensemble_samples": failed_ensemble_samples,
+        "failed_map_chunks": failed_map_chunks,
+        "pipeline_errors": sum(len(output.get("errors", [])) for output in outputs),
+        "stub": stub_stats
+    }
+    if stub_stats:
+        summary["llm_requests_per_second"] = round(stub_stats["requests"] / wall_clock, 3) if wall_clock else None
+        summary["llm_error_responses"] = stub_stats["injected_429"] + stub_stats["injected_5xx"] + stub_stats["throttled"]
+        # Both counts are HTTP requests, so this is the share of requests the clients had to retry or give up on
+        summary["llm_request_success_rate"] = round(stub_stats["responses_ok"] / stub_stats["requests"], 3) if stub_stats["requests"] else None
+
+    print("\n--- Load Test Summary ---")
+    print(f"Papers: {summary['papers']} | Criteria: {summary['criteria_evaluated']} | Wall clock: {summary['wall_clock_seconds']:.1f}s")
+    print(f"Throughput: {summary['papers_per_second']} papers/s, {summary['criteria_per_second']} criteria/s"
+          + (f", {summary['llm_requests_per_second']} LLM requests/s" if stub_stats else ""))
+    print(f"Criterion latency: p50 {_format_seconds(summary['criterion_latency_p50'])}, p95 {_format_seconds(summary['criterion_latency_p95'])}, "
+          f"p99 {_format_seconds(summary['criterion_latency_p99'])}, max {_format_seconds(summary['criterion_latency_max'])}")
+    print(f"Paper latency: p50 {_format_seconds(summary['paper_latency_p50'])}, p95 {_format_seconds(summary['paper_latency_p95'])}")
+    if stub_stats:
+        print(f"LLM requests: {stub_stats['requests']} sent, {stub_stats['responses_ok']} ok, {summary['llm_error_responses']} errors "
+              f"({stub_stats['injected_429']} x 429, {stub_stats['injected_5xx']} x 5xx, {stub_stats['throttled']} throttled) "
+              f"| Success rate: {summary['llm_request_success_rate'] if summary['llm_request_success_rate'] is not None else 'N/A'}")
+    print(f"Unrecovered: {failed_criteria} failed criteria, {summary['pipeline_errors']} pipeline errors, {fast_tier_errors} fast-tier errors (escalated), "
+          f"{failed_ensemble_samples} failed ensemble samples, {failed_map_chunks} failed map chunks")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary saved to: {args.output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive full cohorts through the evaluator against a local stub LLM server and report throughput, tail latency and error recovery.")
+    parser.add_argument("--pdf_dir", type=str, default="/home/ubuntu/academic_evaluator/pdfs",
+                        help="Directory containing the PDF files of the cohort.")
+    parser.add_argument("--config_file", type=str, default="/home/ubuntu/academic_evaluator/config/criteria.json",
+                        help="Path to the criteria configuration JSON file.")
+    parser.add_argument("--cache_dir", type=str, default=None,
+                        help="Cache directory. Defaults to no persistent cache, so repeated runs hit the stub again.")
+    parser.add_argument("--repeat", type=int, default=1, help="Evaluate each PDF this many times to build a larger cohort.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of papers evaluated concurrently.")
+    parser.add_argument("--openai_base_url", type=str, default=None,
+                        help="Send OpenAI traffic to an already running stub (or gateway) instead of the local stub; e.g. http://127.0.0.1:8088/v1.")
+    parser.add_argument("--gemini_base_url", type=str, default=None,
+                        help="Send Gemini traffic to an already running stub (or gateway) instead of the local stub; e.g. http://127.0.0.1:8088.")
+    parser.add_argument("--output", type=str, default=None, help="Optional path to save the load-test summary as JSON.")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.pdf_dir):
+        print(f"Error: PDF directory not found: {args.pdf_dir}")
+        return
+    pdf_files = sorted(os.path.join(args.pdf_dir, f) for f in os.listdir(args.pdf_dir) if f.lower().endswith(".pdf"))
+    if not pdf_files:
+        print(f"No PDF files found in {args.pdf_dir}. Exiting.")
+        return
+    cohort = pdf_files * args.repeat
+
+    stub = None
+    base_urls = {"openai": args.openai_base_url, "gemini": args.gemini_base_url}
+    if not base_urls["openai"] or not base_urls["gemini"]:
+        # Providers without an override go to the local stub, never to the real API
+        stub = stub_from_args(args, port=0).start() # Port 0 picks a free port
+        base_urls["openai"] = base_urls["openai"] or stub.openai_base_url
+        base_urls["gemini"] = base_urls["gemini"] or stub.gemini_base_url
+        print(f"Started stub LLM server at {stub.gemini_base_url}")
+    try:
+        _run(args, cohort, base_urls, stub)
+    finally:
+        if stub:
+            stub.stop()
+
+if __name__ == "__main__":
+    main()
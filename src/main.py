@@ -8,6 +8,7 @@ from datetime import datetime
 
 from .orchestrator import AcademicPaperOrchestrator
 from .reporter import CSVReporter
+from .agents.cascade_agent import cascade_call_records, summarize_cascade
 
 def main():
     parser = argparse.ArgumentParser(description="Academic Paper Evaluator using LLMs and Langgraph.")
@@ -19,6 +20,12 @@ def main():
                         help="Directory to save the evaluation reports.")
     parser.add_argument("--ref_materials_dir", type=str, default="/home/ubuntu/academic_evaluator/reference_materials",
                         help="Directory containing reference material files (e.g., State of AI Report PPTX).")
+    parser.add_argument("--cache_dir", type=str, default="/home/ubuntu/academic_evaluator/cache",
+                        help="Directory for cached intermediate results (e.g., long-document chunk notes).")
+    parser.add_argument("--openai_base_url", type=str, default=None,
+                        help="Override the OpenAI API endpoint (e.g., http://127.0.0.1:8088/v1 for the local stub server).")
+    parser.add_argument("--gemini_base_url", type=str, default=None,
+                        help="Override the Gemini API endpoint (e.g., http://127.0.0.1:8088 for the local stub server).")
     
     args = parser.parse_args()
 
@@ -37,7 +44,8 @@ def main():
 
     # Initialize Orchestrator
     # The orchestrator now internally handles reference material paths based on config
-    orchestrator = AcademicPaperOrchestrator(config_path=args.config_file)
+    base_urls = {"openai": args.openai_base_url, "gemini": args.gemini_base_url}
+    orchestrator = AcademicPaperOrchestrator(config_path=args.config_file, cache_dir=args.cache_dir, base_urls=base_urls)
     if not orchestrator.criteria:
         print(f"Could not load criteria from {args.config_file}. Exiting.")
         return
@@ -82,6 +90,18 @@ def main():
             print(f"\nOverall evaluation complete. Report saved to: {report_file_path}")
         else:
             print("\nOverall evaluation complete, but report generation failed.")
+
+        # Cascade routing statistics (only present for criteria configured with a "cascade" block)
+        cascade_records = cascade_call_records(all_results_for_report, orchestrator.criteria, orchestrator.model_pricing)
+        if cascade_records:
+            reporter.generate_cascade_report(cascade_records)
+            print("\nCascade routing summary:")
+            for summary in summarize_cascade(all_results_for_report, orchestrator.criteria, orchestrator.model_pricing):
+                latency_saved = f"{summary['latency_saved_seconds']:.1f}s" if summary["latency_saved_seconds"] is not None else "N/A"
+                cost_saved = f"${summary['cost_saved']:.4f}" if summary["cost_saved"] is not None else "N/A"
+                print(f"  {summary['criterion_id']}: {summary['escalations']}/{summary['calls']} escalated "
+                      f"({summary['escalation_rate']:.0%}, reasons: {summary['reasons'] or '-'}) "
+                      f"{summary['fast_model']} -> {summary['strong_model']}, latency saved: {latency_saved}, cost saved: {cost_saved}")
     else:
         print("\nNo results to report.")
     
@@ -2,12 +2,15 @@
 
 import json
 import os
-from typing import TypedDict, List, Dict, Any
+import time
+from typing import TypedDict, List, Dict, Any, Callable, Optional
 from langgraph.graph import StateGraph, END
 
+from .cache import FileCache
 from .pdf_parser import PDFParser
 from .reference_parser import ReferenceParser
 from .agents.base_agent import BaseEvaluationAgent
+from .agents.cascade_agent import CascadeEvaluationAgent
 
 # Define the state for the graph
 class EvaluationState(TypedDict):
@@ -22,24 +25,35 @@ class EvaluationState(TypedDict):
     error_messages: List[str]
 
 class AcademicPaperOrchestrator:
-    def __init__(self, config_path="/home/ubuntu/academic_evaluator/config/criteria.json"):
+    def __init__(self, config_path="/home/ubuntu/academic_evaluator/config/criteria.json", cache_dir=None, base_urls=None):
         self.config_path = config_path
-        self.criteria = self._load_criteria()
-        self.pdf_parser = PDFParser()
+        self.base_urls = base_urls or {} # Provider endpoint overrides ("openai", "gemini"), e.g. for load testing
+        self.config = self._load_config()
+        self.criteria = self.config.get("criteria", [])
+        self.model_pricing = self.config.get("model_pricing", {}) # USD per million tokens, used for cascade cost reporting
+        # Papers longer than max_chars are evaluated map-reduce over page-aligned chunks of at most chunk_chars
+        self.long_document_config = self.config.get("long_document", {})
+        self.notes_cache = FileCache(cache_dir, namespace="chunk_notes")
+        self.pdf_parser = PDFParser(cache_dir=cache_dir, ocr_config=self.config.get("ocr"))
         self.reference_parser = ReferenceParser()
         self.workflow = self._build_graph()
 
-    def _load_criteria(self):
+    def _load_config(self):
         try:
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            return config.get("criteria", [])
+                return json.load(f)
         except FileNotFoundError:
             print(f"Error: Configuration file not found at {self.config_path}")
-            return []
+            return {}
         except json.JSONDecodeError:
             print(f"Error: Could not decode JSON from {self.config_path}")
-            return []
+            return {}
+
+    def _create_agent(self, criterion_config, api_keys):
+        # Criteria with a "cascade" block try a fast model first and escalate to the configured one when needed
+        if criterion_config.get("cascade"):
+            return CascadeEvaluationAgent(criterion_config=criterion_config, api_keys=api_keys, base_urls=self.base_urls)
+        return BaseEvaluationAgent(criterion_config=criterion_config, api_keys=api_keys, base_urls=self.base_urls)
 
     # Define node functions
     def start_evaluation_node(self, state: EvaluationState) -> EvaluationState:
@@ -121,12 +135,15 @@ class AcademicPaperOrchestrator:
                 "max_points": current_criterion["max_points"],
                 "justification": "Avaliação não pôde ser realizada: Falha ao extrair texto do PDF.",
                 "llm_provider": current_criterion.get("llm_provider"),
-                "model_name": current_criterion.get("model_name")
+                "model_name": current_criterion.get("model_name"),
+                "evaluation_failed": True # The score is a placeholder, not a grade
             }
             state["evaluation_results"].append(result)
             return state
 
-        agent = BaseEvaluationAgent(criterion_config=current_criterion, api_keys=state["api_keys"])
+        # End-to-end time for the criterion, covering cascade tiers, ensemble samples and the map phase
+        start = time.perf_counter()
+        agent = self._create_agent(current_criterion, state["api_keys"])
         
         # For simplicity, we pass the whole PDF text. 
         # In a more advanced setup, we might pass only relevant sections.
@@ -143,11 +160,23 @@ class AcademicPaperOrchestrator:
                 "max_points": current_criterion["max_points"],
                 "justification": f"Avaliação não pôde ser realizada: Material de referência obrigatório '{current_criterion.get('reference_document')}' não pôde ser carregado ou processado.",
                 "llm_provider": current_criterion.get("llm_provider"),
-                "model_name": current_criterion.get("model_name")
+                "model_name": current_criterion.get("model_name"),
+                "evaluation_failed": True
             }
         else:
             try:
-                result = agent.evaluate(paper_text_segment=paper_segment, reference_material_text=ref_text)
+                max_chars = self.long_document_config.get("max_chars", 300000)
+                if len(paper_segment) > max_chars:
+                    chunks = self.pdf_parser.split_into_chunks(paper_segment, self.long_document_config.get("chunk_chars", 60000))
+                    print(f"Paper exceeds {max_chars} characters; evaluating {current_criterion['name']} over {len(chunks)} chunks.")
+                    result = agent.evaluate_long_document(
+                        chunks,
+                        reference_material_text=ref_text,
+                        notes_cache=self.notes_cache,
+                        max_workers=self.long_document_config.get("max_workers", 4)
+                    )
+                else:
+                    result = agent.evaluate(paper_text_segment=paper_segment, reference_material_text=ref_text)
             except Exception as e:
                 error_msg = f"Error during agent evaluation for criterion {current_criterion['name']}: {str(e)}"
                 print(error_msg)
@@ -159,9 +188,11 @@ class AcademicPaperOrchestrator:
                     "max_points": current_criterion["max_points"],
                     "justification": f"Erro crítico durante a avaliação pelo agente: {str(e)}",
                     "llm_provider": current_criterion.get("llm_provider"),
-                    "model_name": current_criterion.get("model_name")
+                    "model_name": current_criterion.get("model_name"),
+                    "evaluation_failed": True
                 }
 
+        result["criterion_latency_seconds"] = round(time.perf_counter() - start, 3)
         state["evaluation_results"].append(result)
         return state
 
@@ -202,7 +233,8 @@ class AcademicPaperOrchestrator:
         )
         return graph_builder.compile()
 
-    def run_evaluation(self, pdf_path: str, api_keys: Dict[str, str]) -> Dict[str, Any]:
+    def run_evaluation(self, pdf_path: str, api_keys: Dict[str, str],
+                       on_criterion_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         if not self.criteria:
             print("No criteria loaded. Cannot run evaluation.")
             return {"pdf_path": pdf_path, "evaluations": [], "errors": ["No criteria loaded from configuration."]}
@@ -219,7 +251,18 @@ class AcademicPaperOrchestrator:
             error_messages=[]
         )
         
-        final_state = self.workflow.invoke(initial_state)
+        if on_criterion_result is None:
+            final_state = self.workflow.invoke(initial_state)
+        else:
+            # Stream the graph so each criterion result is reported as soon as its node finishes
+            final_state = initial_state
+            reported = 0
+            for state in self.workflow.stream(initial_state, stream_mode="values"):
+                final_state = state
+                results = state.get("evaluation_results", [])
+                for result in results[reported:]:
+                    on_criterion_result(result)
+                reported = len(results)
         
         return {
             "pdf_path": pdf_path,
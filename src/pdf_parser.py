@@ -2,14 +2,129 @@
 
 import pypdf
 import os
+import multiprocessing
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import FileCache, content_hash
+
+# OCR is optional: it needs the Tesseract and Poppler binaries besides these Python packages
+try:
+    import pytesseract
+    from pdf2image import convert_from_path, pdfinfo_from_path
+except ImportError:
+    pytesseract = None
+    convert_from_path = None
+    pdfinfo_from_path = None
+
+PAGE_BREAK = "\n\n--- Page Break ---\n\n"
+
+def _ocr_page(pdf_path, page_number, lang, dpi):
+    """Rasterizes and OCRs a single page (1-based). Module-level so it can run in a process pool."""
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    return "\n".join(pytesseract.image_to_string(image, lang=lang) for image in images)
 
 class PDFParser:
-    def __init__(self):
-        pass
+    def __init__(self, cache_dir=None, ocr_config=None):
+        """
+        Args:
+            cache_dir (str | None): Directory for the extraction cache. If None, results are only cached in memory.
+            ocr_config (dict | None): OCR fallback settings ("enabled", "min_chars", "max_workers", "lang", "dpi").
+        """
+        self.ocr_config = ocr_config or {}
+        # Extracted texts can be megabytes each, so only a few are kept in memory
+        self.text_cache = FileCache(cache_dir, namespace="pdf_text", max_memory_entries=16)
+        self._ocr_status = None # Checked on first use, since it looks up the external binaries
+
+    def _ocr_available(self):
+        if self._ocr_status is None:
+            if not self.ocr_config.get("enabled", True):
+                self._ocr_status = False
+            elif pytesseract is None:
+                print("Warning: OCR fallback unavailable. Install pytesseract and pdf2image (plus the Tesseract and Poppler binaries).")
+                self._ocr_status = False
+            elif not shutil.which(pytesseract.pytesseract.tesseract_cmd) or not shutil.which("pdftoppm"):
+                print("Warning: OCR fallback unavailable. The Tesseract and Poppler (pdftoppm) binaries must be on the PATH.")
+                self._ocr_status = False
+            else:
+                self._ocr_status = True
+        return self._ocr_status
+
+    def _text_cache_key(self, pdf_bytes):
+        # Extraction output depends on whether OCR can actually run and, if so, on the settings that change its text
+        if self._ocr_available():
+            ocr_settings = f"ocr:{self.ocr_config.get('lang', 'por+eng')}:{self.ocr_config.get('dpi', 300)}:{self.ocr_config.get('min_chars', 20)}"
+        else:
+            ocr_settings = "no-ocr"
+        return content_hash(pdf_bytes, ocr_settings)
+
+    def _ocr_pages(self, pdf_path, page_numbers):
+        """OCRs the given pages (1-based) across a process pool.
+
+        Returns:
+            tuple: (dict of page number -> OCR text, list of page numbers whose OCR failed).
+        """
+        lang = self.ocr_config.get("lang", "por+eng")
+        dpi = self.ocr_config.get("dpi", 300)
+        print(f"Running OCR on {len(page_numbers)} page(s) without a text layer in {pdf_path}")
+        ocr_texts = {}
+        failed_pages = []
+        # Spawned workers don't inherit the parent's threads and locks (the orchestrator runs parsing alongside HTTP clients)
+        with ProcessPoolExecutor(max_workers=self.ocr_config.get("max_workers"), mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {page_number: executor.submit(_ocr_page, pdf_path, page_number, lang, dpi) for page_number in page_numbers}
+            for page_number, future in futures.items():
+                try:
+                    ocr_texts[page_number] = future.result()
+                except Exception as e:
+                    print(f"Error during OCR of page {page_number} of {pdf_path}: {e}")
+                    failed_pages.append(page_number)
+        return ocr_texts, failed_pages
+
+    def _extract_pages(self, pdf_path):
+        """Extracts the text layer of each page, falling back to OCR for pages with (nearly) no text.
+
+        Returns:
+            tuple: (list of page texts, bool telling whether every page needing OCR was OCRed successfully).
+        """
+        try:
+            reader = pypdf.PdfReader(pdf_path)
+            pages = []
+            for page in reader.pages:
+                try:
+                    pages.append(page.extract_text() or "")
+                except Exception as e:
+                    print(f"Error extracting text from a page of {pdf_path}: {e}")
+                    pages.append("")
+        except Exception as e:
+            print(f"Error extracting text from PDF {pdf_path}: {e}")
+            # The text layer is unreadable as a whole; OCR every page if possible
+            if not self._ocr_available():
+                return [], False
+            try:
+                page_count = pdfinfo_from_path(pdf_path)["Pages"]
+            except Exception as info_error:
+                print(f"Error reading page count of {pdf_path} for OCR: {info_error}")
+                return [], False
+            pages = [""] * page_count
+
+        # Only scanned pages pay the OCR cost
+        min_chars = self.ocr_config.get("min_chars", 20)
+        scanned_pages = [page_num + 1 for page_num, page_text in enumerate(pages) if len(page_text.strip()) < min_chars]
+        if not scanned_pages or not self._ocr_available():
+            return pages, True
+        ocr_texts, failed_pages = self._ocr_pages(pdf_path, scanned_pages)
+        for page_number, ocr_text in ocr_texts.items():
+            if len(ocr_text.strip()) > len(pages[page_number - 1].strip()):
+                pages[page_number - 1] = ocr_text
+        return pages, not failed_pages
 
     def extract_text(self, pdf_path):
         """Extracts text from a given PDF file.
 
+        Pages without a usable text layer (e.g. scanned pages) are OCRed when the optional OCR
+        dependencies are installed. Results are cached by file content and OCR settings; extractions
+        where the OCR of some page failed are returned but not cached, so they are retried.
+
         Args:
             pdf_path (str): The absolute path to the PDF file.
 
@@ -19,21 +134,62 @@ class PDFParser:
         if not os.path.exists(pdf_path):
             print(f"Error: PDF file not found at {pdf_path}")
             return ""
-        
+
         try:
-            reader = pypdf.PdfReader(pdf_path)
-            text = ""
-            for page_num in range(len(reader.pages)):
-                page = reader.pages[page_num]
-                text += page.extract_text()
-                if page_num < len(reader.pages) - 1:
-                    text += "\n\n--- Page Break ---\n\n" # Add a separator for clarity between pages
-            return text
-        except Exception as e:
-            print(f"Error extracting text from PDF {pdf_path}: {e}")
-            # In a more robust system, might try OCR or browser rendering here as per knowledge.
-            # For now, returning empty string on failure.
+            with open(pdf_path, 'rb') as f:
+                cache_key = self._text_cache_key(f.read())
+        except OSError as e:
+            print(f"Error reading PDF {pdf_path}: {e}")
+            return ""
+        cached_text = self.text_cache.get(cache_key)
+        if cached_text is not None:
+            return cached_text
+
+        pages, complete = self._extract_pages(pdf_path)
+        if not any(page_text.strip() for page_text in pages):
+            # Failed extractions aren't cached so they are retried, e.g. after installing OCR support
             return ""
+        text = PAGE_BREAK.join(pages) # Add a separator for clarity between pages
+        if complete:
+            self.text_cache.set(cache_key, text)
+        else:
+            print(f"Warning: OCR failed for some pages of {pdf_path}; the partial text is not cached.")
+        return text
+
+    def split_into_chunks(self, text, max_chars):
+        """Splits extracted PDF text into page-aligned chunks of at most `max_chars` characters.
+
+        Pages are delimited by the "--- Page Break ---" markers added by `extract_text`. Consecutive pages
+        are grouped while they fit; a single page longer than `max_chars` is split on its own.
+
+        Args:
+            text (str): Text returned by `extract_text`.
+            max_chars (int): Maximum number of characters per chunk.
+
+        Returns:
+            list: The chunks, in page order.
+
+        Raises:
+            ValueError: If `max_chars` is not positive.
+        """
+        if max_chars <= 0:
+            raise ValueError(f"max_chars must be positive, got {max_chars}.")
+        chunks = []
+        current = ""
+        for page in text.split(PAGE_BREAK.strip()):
+            page = page.strip()
+            if not page:
+                continue
+            if current and len(current) + len(PAGE_BREAK) + len(page) > max_chars:
+                chunks.append(current)
+                current = ""
+            while len(page) > max_chars:
+                chunks.append(page[:max_chars])
+                page = page[max_chars:]
+            current = f"{current}{PAGE_BREAK}{page}" if current else page
+        if current:
+            chunks.append(current)
+        return chunks
 
 if __name__ == '__main__':
     # Example Usage (for testing purposes)
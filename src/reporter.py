@@ -49,6 +49,8 @@ class CSVReporter:
 
             if evaluations:
                 for eval_result in evaluations:
+                    ensemble_info = eval_result.get("ensemble") or {}
+                    long_document_info = eval_result.get("long_document") or {}
                     flat_data.append({
                         "Paper_Filename": paper_filename,
                         "Criterion_ID": eval_result.get("criterion_id", "N/A"),
@@ -58,7 +60,15 @@ class CSVReporter:
                         "Score": eval_result.get("score", "N/A"),
                         "Max_Points": eval_result.get("max_points", "N/A"),
                         "Justification": eval_result.get("justification", "N/A"),
-                        "Evaluation_Errors": ""
+                        "Evaluation_Errors": "; ".join(eval_result.get("evaluation_errors", [])),
+                        "Ensemble_Scores": " ".join(str(score) for score in ensemble_info.get("scores", [])),
+                        "Score_Spread": ensemble_info.get("spread", ""),
+                        "Map_Model": long_document_info.get("map_model", ""),
+                        "Map_Chunks": long_document_info.get("chunks", ""),
+                        "Map_Failed_Chunks": long_document_info.get("failed_chunks", ""),
+                        "Map_Latency_Seconds": long_document_info.get("map_latency_seconds", ""),
+                        "Map_Input_Tokens": long_document_info.get("map_input_tokens", ""),
+                        "Map_Output_Tokens": long_document_info.get("map_output_tokens", "")
                     })
             
             if errors:
@@ -84,7 +94,9 @@ class CSVReporter:
         column_order = [
             "Paper_Filename", "Criterion_ID", "Criterion_Name", 
             "Score", "Max_Points", "Justification", 
-            "Assigned_LLM_Provider", "Assigned_LLM_Model", "Evaluation_Errors"
+            "Assigned_LLM_Provider", "Assigned_LLM_Model", "Evaluation_Errors",
+            "Ensemble_Scores", "Score_Spread",
+            "Map_Model", "Map_Chunks", "Map_Failed_Chunks", "Map_Latency_Seconds", "Map_Input_Tokens", "Map_Output_Tokens"
         ]
         # Reorder columns, only including those present in the DataFrame to avoid errors
         df = df.reindex(columns=[col for col in column_order if col in df.columns])
@@ -101,6 +113,59 @@ class CSVReporter:
             print(f"Error generating CSV report: {e}")
             return None
 
+    def generate_cascade_report(self, cascade_records, filename_prefix="cascade_report"):
+        """Generates a per-call CSV report of the model cascade decisions of a run.
+
+        Args:
+            cascade_records (list): Records produced by `cascade_call_records`, one per cascaded criterion call.
+            filename_prefix (str): Prefix for the report filename.
+
+        Returns:
+            str: The absolute path to the generated CSV report, or None if there was nothing to report or generation failed.
+        """
+        if not cascade_records:
+            return None
+
+        flat_data = []
+        for record in cascade_records:
+            flat_data.append({
+                "Paper_Filename": os.path.basename(record.get("pdf_path") or "Unknown PDF"),
+                "Criterion_ID": record.get("criterion_id"),
+                "Fast_Model": record.get("fast_model"),
+                "Fast_Score": record.get("fast_score"),
+                "Fast_Confidence": record.get("fast_confidence"),
+                "Escalated": record.get("escalated"),
+                "Escalation_Reason": record.get("reason") or "",
+                "Strong_Model": record.get("strong_model"),
+                "Strong_Score": record.get("strong_score"),
+                "Strong_Failed": record.get("strong_failed"),
+                "Final_Score": record.get("final_score"),
+                "Shadow": record.get("shadow"),
+                "Fast_Latency_Seconds": record.get("fast_latency_seconds"),
+                "Strong_Latency_Seconds": record.get("strong_latency_seconds"),
+                "Fast_Input_Tokens": record.get("fast_input_tokens"),
+                "Fast_Output_Tokens": record.get("fast_output_tokens"),
+                "Strong_Input_Tokens": record.get("strong_input_tokens"),
+                "Strong_Output_Tokens": record.get("strong_output_tokens"),
+                "Map_Model": record.get("map_model"),
+                "Map_Input_Tokens": record.get("map_input_tokens"),
+                "Map_Output_Tokens": record.get("map_output_tokens"),
+                "Actual_Cost_USD": record.get("actual_cost"),
+                "Strong_Only_Cost_USD": record.get("strong_only_cost")
+            })
+
+        df = pd.DataFrame(flat_data)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = os.path.join(self.report_dir, f"{filename_prefix}_{timestamp}.csv")
+
+        try:
+            df.to_csv(report_path, index=False, encoding='utf-8')
+            print(f"Cascade report generated successfully: {report_path}")
+            return report_path
+        except Exception as e:
+            print(f"Error generating cascade CSV report: {e}")
+            return None
+
 if __name__ == '__main__':
     # Example Usage (for testing purposes)
     print("CSVReporter class defined.")
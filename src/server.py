@@ -0,0 +1,401 @@
+# src/server.py
+
+import os
+import argparse
+import json
+import queue
+import re
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .orchestrator import AcademicPaperOrchestrator
+
+class EvaluationJobService:
+    """Queues evaluation jobs and runs them with bounded concurrency on a single, warm orchestrator.
+
+    Each job records its per-criterion results as they finish, so clients can follow them while the
+    rest of the paper is still being evaluated. Finished jobs are kept for a while so their results can
+    be fetched, then evicted together with their uploaded PDF.
+
+    Args:
+        orchestrator (AcademicPaperOrchestrator): Shared orchestrator; criteria and caches are loaded once.
+        api_keys (dict): API keys passed to every evaluation.
+        upload_dir (str): Directory where uploaded PDFs are stored.
+        max_concurrent_jobs (int): Number of jobs evaluated at the same time; the rest wait in the queue.
+        max_finished_jobs (int | None): Number of finished jobs kept; the oldest are evicted first. None keeps all.
+        job_ttl_seconds (float | None): Time a finished job is kept after it finishes. None keeps it until evicted by count.
+    """
+
+    def __init__(self, orchestrator, api_keys, upload_dir, max_concurrent_jobs=2, max_finished_jobs=100, job_ttl_seconds=3600):
+        self.orchestrator = orchestrator
+        self.api_keys = api_keys
+        self.upload_dir = upload_dir
+        self.max_finished_jobs = max_finished_jobs
+        self.job_ttl_seconds = job_ttl_seconds
+        if not os.path.exists(self.upload_dir):
+            os.makedirs(self.upload_dir)
+
+        self.jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._changed = threading.Condition(self._jobs_lock) # Notified whenever any job gains an event
+        self._queue = queue.Queue()
+        self._workers = [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(max_concurrent_jobs)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, pdf_path, filename=None, uploaded=False):
+        """Queues a PDF for evaluation. If `uploaded`, the file belongs to the job and is deleted when the job is evicted."""
+        self._evict_finished_jobs()
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "pdf_path": pdf_path,
+            "uploaded": uploaded,
+            "filename": filename or os.path.basename(pdf_path),
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "total_criteria": len(self.orchestrator.criteria),
+            "evaluations": [],
+            "errors": [],
+            "events": []
+        }
+        with self._jobs_lock:
+            self.jobs[job_id] = job
+            self._add_event(job, "status", {"status": "queued"})
+        self._queue.put(job_id)
+        return self.job_summary(job_id)
+
+    def save_upload(self, data, filename=None):
+        """Stores an uploaded PDF and submits it as a job."""
+        safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename or "upload.pdf")) or "upload.pdf"
+        pdf_path = os.path.join(self.upload_dir, f"{uuid.uuid4().hex}_{safe_name}")
+        with open(pdf_path, 'wb') as f:
+            f.write(data)
+        return self.submit(pdf_path, filename=safe_name, uploaded=True)
+
+    def _evict_finished_jobs(self):
+        """Drops finished jobs past the TTL or beyond `max_finished_jobs`, deleting their uploaded PDFs."""
+        now = time.time()
+        with self._jobs_lock:
+            finished = sorted((job for job in self.jobs.values() if job["finished_at"] is not None), key=lambda job: job["finished_at"])
+            expired = [job for job in finished if self.job_ttl_seconds is not None and now - job["finished_at"] >= self.job_ttl_seconds]
+            remaining = finished[len(expired):]
+            if self.max_finished_jobs is not None and len(remaining) > self.max_finished_jobs:
+                expired += remaining[:len(remaining) - self.max_finished_jobs]
+            # Deleting under the lock keeps eviction atomic: a job that can no longer be found has no upload left.
+            # Event streams still open on an evicted job keep their own reference to it.
+            for job in expired:
+                del self.jobs[job["job_id"]]
+                if job["uploaded"]:
+                    try:
+                        os.remove(job["pdf_path"])
+                    except OSError as e:
+                        print(f"Warning: Could not delete upload {job['pdf_path']} of evicted job {job['job_id']}: {e}")
+        return len(expired)
+
+    def _add_event(self, job, event, data):
+        # Callers hold self._jobs_lock
+        job["events"].append({"event": event, "data": data})
+        self._changed.notify_all()
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._queue.get()
+            with self._jobs_lock:
+                job = self.jobs[job_id]
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                self._add_event(job, "status", {"status": "running"})
+            print(f"Job {job_id}: evaluating {job['filename']}")
+
+            def on_criterion_result(result, job=job):
+                with self._jobs_lock:
+                    job["evaluations"].append(result)
+                    self._add_event(job, "criterion", result)
+
+            try:
+                output = self.orchestrator.run_evaluation(pdf_path=job["pdf_path"], api_keys=self.api_keys,
+                                                          on_criterion_result=on_criterion_result)
+                with self._jobs_lock:
+                    job["errors"] = output.get("errors", [])
+                    job["status"] = "completed"
+            except Exception as e:
+                print(f"Critical error during evaluation of job {job_id}: {e}")
+                with self._jobs_lock:
+                    job["errors"].append(f"Critical error in job worker: {str(e)}")
+                    job["status"] = "failed"
+            with self._jobs_lock:
+                job["finished_at"] = time.time()
+                self._add_event(job, "done", self._summary(job))
+            self._evict_finished_jobs()
+            self._queue.task_done()
+
+    def _summary(self, job):
+        # Callers hold self._jobs_lock
+        scores = [result.get("score") for result in job["evaluations"] if isinstance(result.get("score"), (int, float))]
+        max_points = [result.get("max_points") for result in job["evaluations"] if isinstance(result.get("max_points"), (int, float))]
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "filename": job["filename"],
+            "submitted_at": job["submitted_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "criteria_completed": len(job["evaluations"]),
+            "total_criteria": job["total_criteria"],
+            "total_score": sum(scores),
+            "total_max_points": sum(max_points),
+            "queue_position": self._queue_position(job["job_id"]) if job["status"] == "queued" else None
+        }
+
+    def _queue_position(self, job_id):
+        with self._queue.mutex:
+            pending = list(self._queue.queue)
+        return pending.index(job_id) + 1 if job_id in pending else None
+
+    def job_summary(self, job_id):
+        with self._jobs_lock:
+            job = self.jobs.get(job_id)
+            return self._summary(job) if job else None
+
+    def list_jobs(self):
+        self._evict_finished_jobs()
+        with self._jobs_lock:
+            return [self._summary(job) for job in self.jobs.values()]
+
+    def job_results(self, job_id):
+        with self._jobs_lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            results = self._summary(job)
+            results["pdf_path"] = job["pdf_path"]
+            results["evaluations"] = list(job["evaluations"])
+            results["errors"] = list(job["errors"])
+            return results
+
+    def iter_events(self, job_id, timeout=15.0):
+        """Yields the job's events from the start, blocking for new ones until the job finishes.
+
+        Yields None when no event arrived within `timeout`, so the caller can send a keep-alive.
+        Yields nothing if the job does not exist (or was already evicted).
+        """
+        with self._jobs_lock:
+            job = self.jobs.get(job_id)
+        if not job:
+            return
+        index = 0
+        while True:
+            with self._jobs_lock:
+                if index >= len(job["events"]):
+                    self._changed.wait_for(lambda: index < len(job["events"]), timeout=timeout)
+                new_events = job["events"][index:]
+                index += len(new_events)
+            if not new_events:
+                yield None
+                continue
+            for event in new_events:
+                yield event
+                if event["event"] == "done":
+                    return
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    # Set on the subclass created by make_server
+    service = None
+    pdf_root = None
+    max_upload_bytes = 50 * 1024 * 1024
+
+    def log_message(self, format, *args):
+        print(f"[server] {self.address_string()} - {format % args}")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_json(self, status, message):
+        self._send_json(status, {"error": message})
+
+    def _route(self):
+        path = self.path.split("?")[0].rstrip("/")
+        match = re.fullmatch(r"/jobs/([0-9a-f]+)(?:/(results|events))?", path)
+        return path, match
+
+    def do_GET(self):
+        path, match = self._route()
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "criteria": len(self.service.orchestrator.criteria)})
+        elif path == "/jobs":
+            self._send_json(200, {"jobs": self.service.list_jobs()})
+        elif match:
+            # Jobs can be evicted at any time, so each lookup handles a missing job
+            job_id, resource = match.group(1), match.group(2)
+            payload = self.service.job_results(job_id) if resource == "results" else self.service.job_summary(job_id)
+            if payload is None:
+                self._send_error_json(404, f"Job not found: {job_id}")
+            elif resource == "events":
+                self._stream_events(job_id)
+            else:
+                self._send_json(200, payload)
+        else:
+            self._send_error_json(404, f"Unknown path: {self.path}")
+
+    def do_POST(self):
+        path, _ = self._route()
+        if path != "/jobs":
+            self._send_error_json(404, f"Unknown path: {self.path}")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self._send_error_json(400, "Invalid Content-Length header.")
+            return
+        if length <= 0:
+            self._send_error_json(400, "Request body is empty. Send a PDF (application/pdf) or JSON with a 'pdf_path'.")
+            return
+        if length > self.max_upload_bytes:
+            self._send_error_json(413, f"Upload exceeds the limit of {self.max_upload_bytes} bytes.")
+            return
+        body = self.rfile.read(length)
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+
+        if content_type == "application/json":
+            try:
+                pdf_path = json.loads(body).get("pdf_path")
+            except (json.JSONDecodeError, AttributeError):
+                self._send_error_json(400, "Invalid JSON body.")
+                return
+            resolved_path = self._resolve_pdf_path(pdf_path)
+            if not resolved_path:
+                return
+            summary = self.service.submit(resolved_path)
+        elif content_type == "application/pdf":
+            if not body.startswith(b"%PDF"):
+                self._send_error_json(400, "Uploaded body is not a PDF file.")
+                return
+            query = parse_qs(urlsplit(self.path).query)
+            filename = self.headers.get("X-Filename") or query.get("filename", [None])[0]
+            summary = self.service.save_upload(body, filename=filename)
+        else:
+            self._send_error_json(415, "Unsupported Content-Type. Use application/pdf for uploads or application/json with a 'pdf_path'.")
+            return
+
+        summary["links"] = {
+            "status": f"/jobs/{summary['job_id']}",
+            "results": f"/jobs/{summary['job_id']}/results",
+            "events": f"/jobs/{summary['job_id']}/events"
+        }
+        self._send_json(202, summary)
+
+    def _resolve_pdf_path(self, pdf_path):
+        """Validates a server-side path job. Returns the absolute path, or None after sending an error."""
+        if not self.pdf_root:
+            self._send_error_json(403, "Path jobs are disabled. Start the server with --pdf_root to allow them.")
+            return None
+        if not pdf_path or not isinstance(pdf_path, str):
+            self._send_error_json(400, "JSON body must contain a 'pdf_path' string.")
+            return None
+        root = os.path.realpath(self.pdf_root)
+        resolved = os.path.realpath(os.path.join(root, pdf_path))
+        if os.path.commonpath([root, resolved]) != root:
+            self._send_error_json(403, f"Path is outside the allowed PDF root: {pdf_path}")
+            return None
+        if not resolved.lower().endswith(".pdf") or not os.path.isfile(resolved):
+            self._send_error_json(404, f"PDF file not found: {pdf_path}")
+            return None
+        return resolved
+
+    def _stream_events(self, job_id):
+        # Server-sent events by default; newline-delimited JSON when the client asks for it
+        query = parse_qs(urlsplit(self.path).query)
+        ndjson = "application/x-ndjson" in (self.headers.get("Accept") or "") or query.get("format") == ["ndjson"]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson" if ndjson else "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close") # The stream ends by closing the connection
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for event in self.service.iter_events(job_id):
+                if event is None:
+                    self.wfile.write(b"\n" if ndjson else b": keep-alive\n\n")
+                elif ndjson:
+                    self.wfile.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+                else:
+                    self.wfile.write(f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass # Client went away; the job keeps running
+
+
+def make_server(service, host="127.0.0.1", port=8000, pdf_root=None, max_upload_mb=50):
+    handler = type("JobRequestHandler", (_JobRequestHandler,), {
+        "service": service,
+        "pdf_root": pdf_root,
+        "max_upload_bytes": int(max_upload_mb * 1024 * 1024)
+    })
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP job API for the Academic Paper Evaluator.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind.")
+    parser.add_argument("--config_file", type=str, default="/home/ubuntu/academic_evaluator/config/criteria.json",
+                        help="Path to the criteria configuration JSON file.")
+    parser.add_argument("--cache_dir", type=str, default="/home/ubuntu/academic_evaluator/cache",
+                        help="Directory for cached intermediate results (e.g., extracted text, long-document chunk notes).")
+    parser.add_argument("--upload_dir", type=str, default="/home/ubuntu/academic_evaluator/uploads",
+                        help="Directory where uploaded PDFs are stored.")
+    parser.add_argument("--pdf_root", type=str, default=None,
+                        help="Allow jobs that reference PDFs by path, restricted to this directory.")
+    parser.add_argument("--max_concurrent_jobs", type=int, default=2, help="Number of papers evaluated at the same time.")
+    parser.add_argument("--max_upload_mb", type=float, default=50, help="Maximum size of an uploaded PDF, in megabytes.")
+    parser.add_argument("--max_finished_jobs", type=int, default=100,
+                        help="Number of finished jobs kept for result queries; older ones are evicted with their uploaded PDF.")
+    parser.add_argument("--job_ttl_seconds", type=float, default=3600,
+                        help="Seconds a finished job is kept before it is evicted with its uploaded PDF.")
+    parser.add_argument("--openai_base_url", type=str, default=None, help="Override the OpenAI API endpoint.")
+    parser.add_argument("--gemini_base_url", type=str, default=None, help="Override the Gemini API endpoint.")
+    args = parser.parse_args()
+
+    api_keys = {
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY"),
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY")
+    }
+    if not api_keys["OPENAI_API_KEY"] or not api_keys["GEMINI_API_KEY"]:
+        print("Error: OPENAI_API_KEY and/or GEMINI_API_KEY environment variables not set.")
+        print("Please set these API keys to proceed with evaluations.")
+        return
+
+    base_urls = {"openai": args.openai_base_url, "gemini": args.gemini_base_url}
+    orchestrator = AcademicPaperOrchestrator(config_path=args.config_file, cache_dir=args.cache_dir, base_urls=base_urls)
+    if not orchestrator.criteria:
+        print(f"Could not load criteria from {args.config_file}. Exiting.")
+        return
+
+    service = EvaluationJobService(orchestrator, api_keys, upload_dir=args.upload_dir, max_concurrent_jobs=args.max_concurrent_jobs,
+                                   max_finished_jobs=args.max_finished_jobs, job_ttl_seconds=args.job_ttl_seconds)
+    httpd = make_server(service, host=args.host, port=args.port, pdf_root=args.pdf_root, max_upload_mb=args.max_upload_mb)
+    print(f"Academic Paper Evaluator job API listening on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down job API.")
+    finally:
+        httpd.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# src/stub_server.py
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubLLMServer:
+    """Local HTTP server speaking the OpenAI and Gemini chat endpoints used by the evaluation agents.
+
+    It answers in the format expected by `BaseEvaluationAgent._parse_response`, so full cohorts can be
+    run end to end through the real `ChatOpenAI` / `ChatGoogleGenerativeAI` clients.
+
+    Endpoints:
+        POST /v1/chat/completions                     OpenAI (base URL: http://host:port/v1)
+        POST /v1beta/models/{model}:generateContent   Gemini (base URL: http://host:port)
+        GET  /stats                                   Request counters, as JSON
+
+    Args:
+        latency (str): Latency distribution: "fixed", "uniform", "normal" or "lognormal".
+        latency_mean (float): Mean latency in seconds ("uniform" draws from [0, 2 * mean]).
+        latency_stddev (float): Standard deviation in seconds ("normal"), or sigma of the underlying normal ("lognormal").
+        error_rate_429 (float): Probability of answering 429 Too Many Requests.
+        error_rate_5xx (float): Probability of answering 500/502/503.
+        retry_after (float): Value of the Retry-After header sent with injected and throttled errors.
+        max_rps (float | None): Throughput cap; requests above it are throttled with a 429.
+        max_concurrency (int | None): Maximum requests in flight; extra requests are throttled with a 429.
+        seed (int | None): Seed for reproducible latency, error and score draws.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8088, latency="fixed", latency_mean=0.5, latency_stddev=0.2,
+                 error_rate_429=0.0, error_rate_5xx=0.0, retry_after=1.0, max_rps=None, max_concurrency=None, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_stddev = latency_stddev
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.retry_after = retry_after
+        self.max_rps = max_rps
+        self.max_concurrency = max_concurrency
+        self.random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # Token bucket for the throughput cap; it holds at least one token so caps below 1 rps still admit requests
+        self._bucket_capacity = max(1.0, max_rps) if max_rps else 0.0
+        self._tokens = self._bucket_capacity
+        self._last_refill = time.monotonic()
+        self.stats = {"requests": 0, "responses_ok": 0, "injected_429": 0, "injected_5xx": 0, "throttled": 0, "by_status": {}}
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def openai_base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def gemini_base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def _sample_latency(self):
+        with self._lock:
+            if self.latency == "uniform":
+                value = self.random.uniform(0, 2 * self.latency_mean)
+            elif self.latency == "normal":
+                value = self.random.gauss(self.latency_mean, self.latency_stddev)
+            elif self.latency == "lognormal":
+                # Parametrized so the distribution's mean matches latency_mean, with a long right tail
+                sigma = self.latency_stddev
+                mu = math.log(max(self.latency_mean, 1e-6)) - sigma ** 2 / 2
+                value = self.random.lognormvariate(mu, sigma)
+            else:
+                value = self.latency_mean
+        return max(0.0, value)
+
+    def _admit(self):
+        """Applies the throughput caps. Returns True if the request may proceed."""
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                self.stats["throttled"] += 1
+                return False
+            if self.max_rps:
+                now = time.monotonic()
+                self._tokens = min(self._bucket_capacity, self._tokens + (now - self._last_refill) * self.max_rps)
+                self._last_refill = now
+                if self._tokens < 1:
+                    self.stats["throttled"] += 1
+                    return False
+                self._tokens -= 1
+            self._in_flight += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _injected_error(self):
+        """Draws an injected error status, or None for a normal response."""
+        with self._lock:
+            draw = self.random.random()
+            if draw < self.error_rate_429:
+                self.stats["injected_429"] += 1
+                return 429
+            if draw < self.error_rate_429 + self.error_rate_5xx:
+                self.stats["injected_5xx"] += 1
+                return self.random.choice([500, 502, 503])
+            return None
+
+    def _record_status(self, status):
+        with self._lock:
+            self.stats["by_status"][str(status)] = self.stats["by_status"].get(str(status), 0) + 1
+            if status == 200:
+                self.stats["responses_ok"] += 1
+
+    def generate_reply(self, prompt):
+        """Builds an answer in the format the agents expect for the given prompt."""
+        if "NÃO atribua pontuação" in prompt: # Map step of a long-document evaluation
+            return "Notas: - Resposta simulada pelo servidor stub de testes de carga."
+        max_points_match = re.search(r"Pontuação Máxima para este critério:\s*(\d+)", prompt)
+        max_points = int(max_points_match.group(1)) if max_points_match else 1
+        with self._lock:
+            score = self.random.randint(0, max_points)
+            confidence = self.random.randint(40, 100)
+        reply = f"Pontuação: {score}\nJustificativa: Resposta simulada pelo servidor stub de testes de carga."
+        if "Confiança: [" in prompt:
+            reply += f"\nConfiança: {confidence}"
+        return reply
+
+    def get_stats(self):
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, like the real APIs, so connection reuse is exercised
+
+            def log_message(self, format, *args):
+                pass # Per-request logging would dominate the output of a load test
+
+            def _send_json(self, status, payload, headers=None):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                server._record_status(status)
+
+            def _send_error(self, status, message):
+                # Shape shared by both providers' error bodies closely enough for their clients
+                headers = {"Retry-After": f"{server.retry_after:g}"} if status in (429, 503) else None
+                self._send_json(status, {"error": {"code": status, "message": message, "status": "UNAVAILABLE" if status >= 500 else "RESOURCE_EXHAUSTED"}}, headers)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    self._send_json(200, server.get_stats())
+                else:
+                    self._send_json(404, {"error": {"code": 404, "message": f"Unknown path {self.path}"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"code": 400, "message": "Invalid JSON body"}})
+                    return
+
+                path = self.path.split("?")[0]
+                if path.endswith("/chat/completions"):
+                    prompt = "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+                    build_payload = lambda reply: server._openai_payload(request.get("model"), prompt, reply)
+                elif ":generateContent" in path:
+                    prompt = "\n".join(part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", []))
+                    build_payload = lambda reply: server._gemini_payload(path, prompt, reply)
+                else:
+                    self._send_json(404, {"error": {"code": 404, "message": f"Unknown path {self.path}"}})
+                    return
+
+                if not server._admit():
+                    self._send_error(429, "Stub throughput cap exceeded.")
+                    return
+                try:
+                    time.sleep(server._sample_latency())
+                    error_status = server._injected_error()
+                    if error_status:
+                        self._send_error(error_status, "Injected error from stub server.")
+                        return
+                    self._send_json(200, build_payload(server.generate_reply(prompt)))
+                finally:
+                    server._release()
+
+        return Handler
+
+    def _openai_payload(self, model, prompt, reply):
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(reply) // 4 # Rough token estimate
+        return {
+            "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model or "stub",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        }
+
+    def _gemini_payload(self, path, prompt, reply):
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(reply) // 4 # Rough token estimate
+        return {
+            "candidates": [{"content": {"parts": [{"text": reply}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": completion_tokens, "totalTokenCount": prompt_tokens + completion_tokens},
+            "modelVersion": path.split("/models/")[-1].split(":")[0]
+        }
+
+    def start(self):
+        """Starts serving in a background thread and returns self."""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1] # Resolves port 0 to the port actually bound
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+def add_stub_arguments(parser):
+    """Adds the stub server options to an argparse parser (shared with the load-test command)."""
+    parser.add_argument("--latency", type=str, default="lognormal", choices=["fixed", "uniform", "normal", "lognormal"],
+                        help="Latency distribution of the stub responses.")
+    parser.add_argument("--latency_mean", type=float, default=0.5, help="Mean response latency in seconds.")
+    parser.add_argument("--latency_stddev", type=float, default=0.5,
+                        help="Standard deviation in seconds (normal) or sigma of the underlying normal (lognormal).")
+    parser.add_argument("--error_rate_429", type=float, default=0.0, help="Probability of an injected 429 response.")
+    parser.add_argument("--error_rate_5xx", type=float, default=0.0, help="Probability of an injected 500/502/503 response.")
+    parser.add_argument("--retry_after", type=float, default=1.0, help="Retry-After header value, in seconds, for 429/503 responses.")
+    parser.add_argument("--max_rps", type=float, default=None, help="Throughput cap in requests per second (excess gets 429).")
+    parser.add_argument("--max_concurrency", type=int, default=None, help="Maximum requests in flight (excess gets 429).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible latency, error and score draws.")
+
+
+def stub_from_args(args, host="127.0.0.1", port=8088):
+    return StubLLMServer(
+        host=host, port=port, latency=args.latency, latency_mean=args.latency_mean, latency_stddev=args.latency_stddev,
+        error_rate_429=args.error_rate_429, error_rate_5xx=args.error_rate_5xx, retry_after=args.retry_after,
+        max_rps=args.max_rps, max_concurrency=args.max_concurrency, seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI/Gemini-compatible stub server for load testing the evaluator.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=8088, help="Port to bind.")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub = stub_from_args(args, host=args.host, port=args.port).start()
+    print(f"Stub LLM server listening. Use --openai_base_url {stub.openai_base_url} --gemini_base_url {stub.gemini_base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\nStopping stub server. Stats: {json.dumps(stub.get_stats())}")
+        stub.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Make the `src` package importable when running pytest from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
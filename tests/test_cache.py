@@ -0,0 +1,21 @@
+# tests/test_cache.py
+
+from src.cache import FileCache, content_hash
+
+def test_content_hash_separates_parts():
+    assert content_hash("ab", "c") != content_hash("a", "bc")
+
+def test_memory_layer_is_bounded_lru():
+    cache = FileCache(max_memory_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1 # "a" becomes the most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+def test_evicted_entries_are_read_back_from_disk(tmp_path):
+    cache = FileCache(str(tmp_path), "notes", max_memory_entries=0)
+    cache.set("a", {"notes": "texto"})
+    assert len(cache._memory) == 0
+    assert cache.get("a") == {"notes": "texto"}
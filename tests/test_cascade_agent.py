@@ -0,0 +1,196 @@
+# tests/test_cascade_agent.py
+
+import pytest
+
+from src.cache import FileCache
+from src.agents.cascade_agent import CascadeEvaluationAgent, cascade_call_records, summarize_cascade
+
+API_KEYS = {"OPENAI_API_KEY": "test-key", "GEMINI_API_KEY": "test-key"}
+
+CRITERION = {
+    "id": "adequacao_formato_norma",
+    "name": "Adequação ao formato",
+    "description": "Avaliar o formato.",
+    "max_points": 2,
+    "llm_provider": "openai",
+    "model_name": "gpt-4.1",
+    "cascade": {"llm_provider": "gemini", "model_name": "gemini-1.5-flash", "min_confidence": 70, "escalate_on_scores": [1]}
+}
+
+PRICING = {
+    "gpt-4.1": {"input_per_million": 2.0, "output_per_million": 8.0},
+    "gemini-1.5-flash": {"input_per_million": 0.1, "output_per_million": 0.4}
+}
+
+@pytest.fixture
+def agent():
+    # Building the clients makes no network calls
+    return CascadeEvaluationAgent(CRITERION, API_KEYS)
+
+def test_fast_tier_uses_cascade_model_and_asks_for_confidence(agent):
+    assert agent.fast_agent.criterion_config["model_name"] == "gemini-1.5-flash"
+    assert agent.criterion_config["model_name"] == "gpt-4.1"
+    assert "cascade" not in agent.criterion_config
+    assert "Confiança:" in agent.fast_agent._construct_prompt("texto")
+
+@pytest.mark.parametrize("response, score, confidence, expected", [
+    ("Pontuação: 2\nJustificativa: ok\nConfiança: 90", 2, 90, None),
+    ("Pontuação: 2\nJustificativa: ok\nConfiança: 50", 2, 50, "confianca_baixa"),
+    ("Pontuação: 2\nJustificativa: ok", 2, None, "confianca_ausente"),
+    ("Pontuação: 1\nJustificativa: ok\nConfiança: 95", 1, 95, "pontuacao_limite"),
+    ("Pontuação: 5\nJustificativa: ok\nConfiança: 95", 2, 95, "resposta_malformada"),
+    ("sem formato", 0, None, "resposta_malformada"),
+])
+def test_escalation_reason(agent, response, score, confidence, expected):
+    assert agent._escalation_reason(response, score, confidence) == expected
+
+class PromptAwareLLM:
+    """Answers map prompts with notes and evaluation prompts with a confident score."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        content = "Notas: - evidência" if "NÃO atribua pontuação" in prompt else "Pontuação: 2\nJustificativa: ok\nConfiança: 90"
+        return type("Response", (), {"content": content, "usage_metadata": {"input_tokens": 100, "output_tokens": 10}})()
+
+class FailingLLM:
+    def invoke(self, prompt):
+        raise AssertionError("the strong model should not be called")
+
+class ScriptedLLM:
+    def __init__(self, content):
+        self.content = content
+
+    def invoke(self, prompt):
+        return type("Response", (), {"content": self.content, "usage_metadata": {"input_tokens": 100, "output_tokens": 10}})()
+
+class ErrorLLM:
+    def invoke(self, prompt):
+        raise RuntimeError("simulated API error")
+
+def test_strong_failure_keeps_doubted_fast_answer(agent):
+    agent.fast_agent.llm = ScriptedLLM("Pontuação: 2\nJustificativa: ok\nConfiança: 40")
+    agent.llm = ErrorLLM()
+    result = agent.evaluate("texto")
+    assert result["score"] == 2
+    assert not result.get("llm_error")
+    assert result["cascade"]["escalated"] is True
+    assert result["cascade"]["reason"] == "confianca_baixa"
+    assert result["cascade"]["strong_failed"] is True
+
+def test_strong_failure_after_malformed_fast_answer_is_an_error(agent):
+    agent.fast_agent.llm = ScriptedLLM("sem formato")
+    agent.llm = ErrorLLM()
+    result = agent.evaluate("texto")
+    assert result["score"] == 0
+    assert result["llm_error"] is True
+    assert result["cascade"]["strong_failed"] is True
+
+def test_long_document_map_phase_runs_on_fast_tier(agent):
+    agent.fast_agent.llm = PromptAwareLLM()
+    agent.llm = FailingLLM()
+    result = agent.evaluate_long_document(["parte um", "parte dois"])
+    assert result["score"] == 2
+    assert result["cascade"]["escalated"] is False
+    info = result["long_document"]
+    assert (info["map_provider"], info["map_model"]) == ("gemini", "gemini-1.5-flash")
+    assert (info["map_input_tokens"], info["map_output_tokens"]) == (200, 20)
+
+class FlakyMapLLM(PromptAwareLLM):
+    """Fails the map call of the chunk containing "falha"."""
+
+    def invoke(self, prompt):
+        if "NÃO atribua pontuação" in prompt and "falha" in prompt:
+            raise RuntimeError("simulated API error")
+        return super().invoke(prompt)
+
+def test_long_document_with_failed_chunks_is_flagged(agent):
+    agent.fast_agent.llm = FlakyMapLLM()
+    agent.llm = FailingLLM()
+    result = agent.evaluate_long_document(["parte um", "parte com falha", "parte três"])
+    assert result["score"] == 2
+    assert result["long_document"]["failed_chunks"] == 1
+    assert result["partial_evidence"] is True
+    assert result["evaluation_errors"] == ["Avaliação baseada em 2 de 3 partes do documento; 1 parte(s) não puderam ser processadas."]
+
+def test_long_document_notes_are_cached_per_map_model(agent):
+    fast_llm = agent.fast_agent.llm = PromptAwareLLM()
+    agent.llm = FailingLLM()
+    notes_cache = FileCache()
+    agent.evaluate_long_document(["parte um", "parte dois"], notes_cache=notes_cache)
+    result = agent.evaluate_long_document(["parte um", "parte dois"], notes_cache=notes_cache)
+    assert fast_llm.calls == 2 + 1 + 1 # Two map calls, then only the reduce step of each run
+    assert result["long_document"]["cached_chunks"] == 2
+    assert result["long_document"]["map_input_tokens"] is None
+
+    # Notes from another map model must not be reused
+    agent.fast_agent.criterion_config = dict(agent.fast_agent.criterion_config, model_name="gemini-2.0-flash")
+    result = agent.evaluate_long_document(["parte um", "parte dois"], notes_cache=notes_cache)
+    assert result["long_document"]["cached_chunks"] == 0
+
+def test_parse_confidence_accepts_unit_scale(agent):
+    assert agent._parse_confidence("Confiança: 0,8") == pytest.approx(80)
+    assert agent._parse_confidence("Confiança: 75") == 75
+    assert agent._parse_confidence("Justificativa: ok") is None
+
+def _cascade_info(escalated, reason=None, strong_latency=None, strong_tokens=(None, None)):
+    return {
+        "fast_provider": "gemini", "fast_model": "gemini-1.5-flash",
+        "fast_score": 2, "fast_confidence": 90,
+        "fast_latency_seconds": 1.0, "fast_input_tokens": 1000, "fast_output_tokens": 100,
+        "escalated": escalated, "reason": reason,
+        "strong_score": 2 if strong_latency else None, "strong_latency_seconds": strong_latency,
+        "strong_input_tokens": strong_tokens[0], "strong_output_tokens": strong_tokens[1],
+        "shadow": False
+    }
+
+def _run_data():
+    return [{
+        "pdf_path": "/tmp/a.pdf",
+        "evaluations": [
+            {"criterion_id": "adequacao_formato_norma", "score": 2, "model_name": "gemini-1.5-flash", "cascade": _cascade_info(False)},
+            {"criterion_id": "adequacao_formato_norma", "score": 1, "model_name": "gpt-4.1",
+             "cascade": _cascade_info(True, "confianca_baixa", strong_latency=5.0, strong_tokens=(1000, 100))},
+            {"criterion_id": "outro", "score": 1, "model_name": "gpt-4.1"}
+        ]
+    }]
+
+def test_cascade_call_records_costs():
+    records = cascade_call_records(_run_data(), [CRITERION], PRICING)
+    assert len(records) == 2 # Non-cascaded results are skipped
+    kept, escalated = records
+    fast_cost = (1000 * 0.1 + 100 * 0.4) / 1_000_000
+    strong_cost = (1000 * 2.0 + 100 * 8.0) / 1_000_000
+    assert kept["strong_model"] == "gpt-4.1"
+    assert kept["actual_cost"] == pytest.approx(fast_cost)
+    assert kept["strong_only_cost"] == pytest.approx(strong_cost) # Estimated from the fast tier's tokens
+    assert escalated["actual_cost"] == pytest.approx(fast_cost + strong_cost)
+
+def test_cascade_call_records_include_map_phase():
+    data = _run_data()
+    data[0]["evaluations"][0]["long_document"] = {"map_model": "gemini-1.5-flash", "map_input_tokens": 10000, "map_output_tokens": 1000}
+    kept = cascade_call_records(data, [CRITERION], PRICING)[0]
+    fast_cost = (1000 * 0.1 + 100 * 0.4) / 1_000_000
+    strong_cost = (1000 * 2.0 + 100 * 8.0) / 1_000_000
+    assert kept["actual_cost"] == pytest.approx(fast_cost + 10 * fast_cost)
+    assert kept["strong_only_cost"] == pytest.approx(strong_cost + 10 * strong_cost)
+
+def test_cascade_call_records_without_pricing():
+    records = cascade_call_records(_run_data(), [CRITERION], {})
+    assert all(record["actual_cost"] is None for record in records)
+
+def test_summarize_cascade():
+    (summary,) = summarize_cascade(_run_data(), [CRITERION], PRICING)
+    assert summary["calls"] == 2
+    assert summary["escalations"] == 1
+    assert summary["escalation_rate"] == 0.5
+    assert summary["reasons"] == {"confianca_baixa": 1}
+    # Strong-only: 2 x 5s; actual: 2 x 1s fast + 1 x 5s strong
+    assert summary["latency_saved_seconds"] == pytest.approx(3.0)
+    assert summary["cost_saved"] == pytest.approx(2 * 0.0028 - (2 * 0.00014 + 0.0028))
+
+def test_summarize_cascade_unknown_cost():
+    (summary,) = summarize_cascade(_run_data(), [CRITERION], None)
+    assert summary["cost_saved"] is None
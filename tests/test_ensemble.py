@@ -0,0 +1,102 @@
+# tests/test_ensemble.py
+
+import threading
+
+import pytest
+
+from src.agents.base_agent import BaseEvaluationAgent
+
+API_KEYS = {"OPENAI_API_KEY": "test-key", "GEMINI_API_KEY": "test-key"}
+
+def _criterion(**ensemble):
+    return {
+        "id": "analise_critica",
+        "name": "Análise Crítica",
+        "description": "Avaliar a análise crítica.",
+        "max_points": 3,
+        "llm_provider": "openai",
+        "model_name": "gpt-4.1",
+        "ensemble": ensemble
+    }
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+        self.usage_metadata = {"input_tokens": 10, "output_tokens": 5}
+
+class FakeLLM:
+    """Returns the given scores in order, counting how many calls were made."""
+
+    def __init__(self, scores):
+        self.scores = list(scores)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt):
+        with self._lock:
+            score = self.scores[self.calls % len(self.scores)]
+            self.calls += 1
+        if score is None:
+            raise RuntimeError("simulated API error")
+        return FakeResponse(f"Pontuação: {score}\nJustificativa: nota {score}")
+
+def _agent_with_fakes(fakes, **ensemble):
+    agent = BaseEvaluationAgent(_criterion(**ensemble), API_KEYS)
+    agent.ensemble_llms = [(provider, model_name, fake) for provider, model_name, fake in fakes]
+    return agent
+
+@pytest.mark.parametrize("aggregate, scores, expected", [
+    ("median", [1, 2, 3], 2),
+    ("median", [1, 3], 1), # median_low keeps a score that was actually given
+    ("majority", [2, 2, 3], 2),
+    ("majority", [1, 1, 3, 3, 2], 1), # Ties break towards the lower of the most voted scores
+])
+def test_aggregate_scores(aggregate, scores, expected):
+    agent = BaseEvaluationAgent(_criterion(aggregate=aggregate), API_KEYS)
+    assert agent._aggregate_scores(scores) == expected
+
+def test_ensemble_stops_issuing_samples_on_agreement():
+    fake = FakeLLM([2, 2, 2, 2, 2])
+    agent = _agent_with_fakes([("openai", "gpt-4.1", fake)], samples=5, agreement=2)
+    result = agent.evaluate("texto")
+    assert result["score"] == 2
+    assert fake.calls == 2 # max_concurrency defaults to agreement: no extra samples are paid for
+    assert result["ensemble"]["samples_issued"] == 2
+    assert result["ensemble"]["early_stopped"] is True
+
+def test_ensemble_tops_up_on_disagreement_and_failures():
+    fake = FakeLLM([1, None, 3, 1])
+    agent = _agent_with_fakes([("openai", "gpt-4.1", fake)], samples=5, agreement=2, max_concurrency=1)
+    result = agent.evaluate("texto")
+    assert fake.calls == 4
+    assert result["score"] == 1
+    assert result["ensemble"]["scores"] == [1, 3, 1]
+    assert result["ensemble"]["samples_failed"] == 1
+    assert result["ensemble"]["spread"] == 2
+
+def test_ensemble_returns_agreed_score_over_median():
+    fake = FakeLLM([2, 0, 3, 3])
+    agent = _agent_with_fakes([("openai", "gpt-4.1", fake)], samples=5, agreement=2, max_concurrency=1)
+    result = agent.evaluate("texto")
+    assert result["ensemble"]["scores"] == [2, 0, 3, 3]
+    assert result["ensemble"]["agreed"] is True
+    assert result["score"] == 3 # The median of the samples would be 2
+
+def test_ensemble_model_defaults_follow_provider():
+    agent = BaseEvaluationAgent(_criterion(models=[{"llm_provider": "openai"}, {"llm_provider": "gemini"}]), API_KEYS)
+    assert [(provider, model_name) for provider, model_name, _ in agent.ensemble_llms] == [
+        ("openai", "gpt-4.1"), ("gemini", "gemini-1.5-flash-latest")
+    ]
+
+def test_ensemble_labels_result_with_models_used():
+    fakes = [("openai", "gpt-4.1", FakeLLM([2])), ("gemini", "gemini-1.5-flash", FakeLLM([2]))]
+    agent = _agent_with_fakes(fakes, samples=3, agreement=2)
+    result = agent.evaluate("texto")
+    assert result["model_name"] == "gpt-4.1+gemini-1.5-flash"
+    assert result["llm_provider"] == "openai+gemini"
+
+def test_ensemble_all_samples_failed():
+    agent = _agent_with_fakes([("openai", "gpt-4.1", FakeLLM([None]))], samples=3, agreement=2)
+    result = agent.evaluate("texto")
+    assert result["score"] == 0
+    assert result["llm_error"] is True
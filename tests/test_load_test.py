@@ -0,0 +1,15 @@
+# tests/test_load_test.py
+
+import pytest
+
+from src.load_test import _percentile
+
+def test_percentile_of_empty_list_is_none():
+    assert _percentile([], 50) is None
+
+@pytest.mark.parametrize("percentile, expected", [(0, 1), (50, 5), (95, 10), (99, 10), (100, 10)])
+def test_percentile_nearest_rank(percentile, expected):
+    assert _percentile([10, 1, 9, 2, 8, 3, 7, 4, 6, 5], percentile) == expected
+
+def test_percentile_single_value():
+    assert _percentile([0.3], 99) == 0.3
@@ -0,0 +1,69 @@
+# tests/test_pdf_parser.py
+
+import pypdf
+import pytest
+
+from src.pdf_parser import PAGE_BREAK, PDFParser
+
+@pytest.fixture
+def parser():
+    return PDFParser()
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    # Blank pages have no text layer, like scanned ones
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=595, height=842)
+    writer.add_blank_page(width=595, height=842)
+    path = tmp_path / "scanned.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+def _parser_with_fake_ocr(ocr_texts, failed_pages, **ocr_config):
+    parser = PDFParser(ocr_config=ocr_config)
+    parser._ocr_status = True # Pretend the OCR binaries are installed
+    parser.ocr_calls = 0
+    def fake_ocr_pages(pdf_path, page_numbers):
+        parser.ocr_calls += 1
+        return dict(ocr_texts), list(failed_pages)
+    parser._ocr_pages = fake_ocr_pages
+    return parser
+
+def test_extract_text_caches_complete_ocr(scanned_pdf):
+    parser = _parser_with_fake_ocr({1: "texto da página um", 2: "texto da página dois"}, [])
+    assert parser.extract_text(scanned_pdf) == "texto da página um" + PAGE_BREAK + "texto da página dois"
+    parser.extract_text(scanned_pdf)
+    assert parser.ocr_calls == 1
+
+def test_extract_text_does_not_cache_partial_ocr(scanned_pdf):
+    parser = _parser_with_fake_ocr({1: "texto da página um"}, [2])
+    assert parser.extract_text(scanned_pdf).startswith("texto da página um")
+    parser.extract_text(scanned_pdf)
+    assert parser.ocr_calls == 2 # Retried, since page 2 may succeed next time
+
+def test_text_cache_key_depends_on_ocr_settings():
+    no_ocr = PDFParser(ocr_config={"enabled": False})
+    low_dpi = _parser_with_fake_ocr({}, [], dpi=150)
+    high_dpi = _parser_with_fake_ocr({}, [], dpi=300)
+    keys = {parser._text_cache_key(b"%PDF") for parser in (no_ocr, low_dpi, high_dpi)}
+    assert len(keys) == 3
+
+def test_split_into_chunks_groups_pages_that_fit(parser):
+    text = PAGE_BREAK.join(["a" * 10, "b" * 10, "c" * 10])
+    chunks = parser.split_into_chunks(text, 10 + len(PAGE_BREAK) + 10)
+    assert chunks == ["a" * 10 + PAGE_BREAK + "b" * 10, "c" * 10]
+
+def test_split_into_chunks_splits_oversized_page(parser):
+    text = PAGE_BREAK.join(["a" * 5, "b" * 25, "c" * 5])
+    chunks = parser.split_into_chunks(text, 10)
+    assert chunks == ["a" * 5, "b" * 10, "b" * 10, "b" * 5, "c" * 5]
+    assert all(len(chunk) <= 10 for chunk in chunks)
+
+def test_split_into_chunks_skips_empty_pages(parser):
+    assert parser.split_into_chunks(PAGE_BREAK.join(["", "texto", "  "]), 100) == ["texto"]
+
+@pytest.mark.parametrize("max_chars", [0, -1])
+def test_split_into_chunks_rejects_non_positive_size(parser, max_chars):
+    with pytest.raises(ValueError):
+        parser.split_into_chunks("texto", max_chars)
@@ -0,0 +1,84 @@
+# tests/test_server.py
+
+import http.client
+import json
+import os
+import threading
+
+import pytest
+
+from src.server import EvaluationJobService, make_server
+
+class FakeOrchestrator:
+    """Evaluates instantly, or blocks until released when `gate` is set."""
+
+    def __init__(self, gate=None):
+        self.criteria = [{"id": "introducao"}]
+        self.gate = gate
+
+    def run_evaluation(self, pdf_path, api_keys, on_criterion_result=None):
+        if self.gate:
+            self.gate.wait(timeout=5)
+        result = {"criterion_id": "introducao", "score": 1, "max_points": 2}
+        if on_criterion_result:
+            on_criterion_result(result)
+        return {"pdf_path": pdf_path, "evaluations": [result], "errors": []}
+
+def _wait_until_finished(service, job_id):
+    for event in service.iter_events(job_id, timeout=5):
+        if event and event["event"] == "done":
+            return event
+
+def test_finished_jobs_beyond_limit_are_evicted_with_their_uploads(tmp_path):
+    service = EvaluationJobService(FakeOrchestrator(), {}, upload_dir=str(tmp_path), max_concurrent_jobs=1, max_finished_jobs=1)
+    first = service.save_upload(b"%PDF-1.4", filename="a.pdf")
+    first_path = service.job_results(first["job_id"])["pdf_path"]
+    _wait_until_finished(service, first["job_id"])
+    second = service.save_upload(b"%PDF-1.4", filename="b.pdf")
+    _wait_until_finished(service, second["job_id"])
+
+    assert [job["job_id"] for job in service.list_jobs()] == [second["job_id"]]
+    assert service.job_summary(first["job_id"]) is None
+    assert not os.path.exists(first_path)
+    assert service.job_results(second["job_id"])["status"] == "completed"
+    assert list(service.iter_events(first["job_id"])) == []
+
+def test_expired_jobs_are_evicted_but_path_jobs_keep_their_pdf(tmp_path):
+    pdf_path = tmp_path / "paper.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    service = EvaluationJobService(FakeOrchestrator(), {}, upload_dir=str(tmp_path / "uploads"), max_concurrent_jobs=1, job_ttl_seconds=0)
+    job = service.submit(str(pdf_path))
+    _wait_until_finished(service, job["job_id"])
+
+    assert service.list_jobs() == []
+    assert pdf_path.exists()
+
+def test_unfinished_jobs_are_never_evicted(tmp_path):
+    gate = threading.Event()
+    service = EvaluationJobService(FakeOrchestrator(gate), {}, upload_dir=str(tmp_path), max_concurrent_jobs=1,
+                                   max_finished_jobs=0, job_ttl_seconds=0)
+    running = service.save_upload(b"%PDF-1.4")
+    queued = service.save_upload(b"%PDF-1.4")
+    assert {job["job_id"] for job in service.list_jobs()} == {running["job_id"], queued["job_id"]}
+    gate.set()
+    _wait_until_finished(service, queued["job_id"])
+    assert service.list_jobs() == []
+    assert os.listdir(tmp_path) == []
+
+def test_malformed_content_length_gets_400(tmp_path):
+    service = EvaluationJobService(FakeOrchestrator(), {}, upload_dir=str(tmp_path), max_concurrent_jobs=1)
+    httpd = make_server(service, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection(*httpd.server_address, timeout=5)
+        connection.putrequest("POST", "/jobs")
+        connection.putheader("Content-Type", "application/pdf")
+        connection.putheader("Content-Length", "abc")
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 400
+        assert "Content-Length" in json.loads(response.read())["error"]
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,97 @@
+# tests/test_stub_server.py
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.stub_server import StubLLMServer
+
+PROMPT = "Pontuação Máxima para este critério: 3 pontos.\nJustificativa e Confiança: [0-100]"
+
+@pytest.fixture
+def start_stub():
+    stubs = []
+    def start(**options):
+        stub = StubLLMServer(port=0, latency="fixed", latency_mean=0.0, seed=1, **options).start()
+        stubs.append(stub)
+        return stub
+    yield start
+    for stub in stubs:
+        stub.stop()
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read())
+
+def _post_openai(stub):
+    return _post(f"{stub.openai_base_url}/chat/completions", {"model": "gpt-4.1", "messages": [{"role": "user", "content": PROMPT}]})
+
+def test_openai_endpoint_payload(start_stub):
+    stub = start_stub()
+    status, _, body = _post_openai(stub)
+    assert status == 200
+    assert body["model"] == "gpt-4.1"
+    content = body["choices"][0]["message"]["content"]
+    assert content.startswith("Pontuação: ") and "Confiança: " in content
+    usage = body["usage"]
+    assert usage["prompt_tokens"] > 0
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+
+def test_gemini_endpoint_payload(start_stub):
+    stub = start_stub()
+    status, _, body = _post(f"{stub.gemini_base_url}/v1beta/models/gemini-1.5-flash:generateContent",
+                            {"contents": [{"role": "user", "parts": [{"text": PROMPT}]}]})
+    assert status == 200
+    assert body["modelVersion"] == "gemini-1.5-flash"
+    assert body["candidates"][0]["content"]["parts"][0]["text"].startswith("Pontuação: ")
+    usage = body["usageMetadata"]
+    assert usage["totalTokenCount"] == usage["promptTokenCount"] + usage["candidatesTokenCount"]
+    assert stub.get_stats()["responses_ok"] == 1
+
+def test_injected_429_carries_retry_after(start_stub):
+    stub = start_stub(error_rate_429=1.0, retry_after=2.5)
+    status, headers, body = _post_openai(stub)
+    assert status == 429
+    assert headers["Retry-After"] == "2.5"
+    assert body["error"]["code"] == 429
+    assert stub.get_stats()["injected_429"] == 1
+
+def test_injected_5xx(start_stub):
+    stub = start_stub(error_rate_5xx=1.0, retry_after=1)
+    statuses = []
+    for _ in range(10):
+        status, headers, _ = _post_openai(stub)
+        statuses.append(status)
+        if status == 503:
+            assert headers["Retry-After"] == "1"
+    assert set(statuses) <= {500, 502, 503}
+    assert stub.get_stats()["injected_5xx"] == 10
+
+def test_max_concurrency_throttles_extra_requests(start_stub):
+    stub = start_stub()
+    stub.latency_mean = 0.5 # Keep the first request in flight while the second arrives
+    stub.max_concurrency = 1
+    statuses = []
+    threads = [threading.Thread(target=lambda: statuses.append(_post_openai(stub)[0])) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(statuses) == [200, 429]
+    assert stub.get_stats()["throttled"] == 1
+
+def test_max_rps_below_one_still_admits_requests():
+    stub = StubLLMServer(max_rps=0.5)
+    assert stub._admit() is True
+    stub._release()
+    assert stub._admit() is False # The bucket is empty until it refills
+    stub._last_refill -= 2 # Two seconds at 0.5 rps refill one token
+    assert stub._admit() is True
+    assert stub.get_stats()["throttled"] == 1